@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import json
+import time
+from unittest import mock
+import httpx
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+import data_genarator
+from data_genarator import generate_device_data
+import fastapi_server
+from fastapi_server import app, batchers, predict_records, AHUData, ChillerData, GeneratorData
+from tree_engine import CompiledTreeEnsemble, verify
+from datetime import datetime, timedelta
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from data_sender import generate_random_fault_data_bulk
+from trend_analyzer import TrendAnalyzer
+
+# Request schema for each device endpoint
+DEVICE_SCHEMAS = {
+    "ahu": ("AHU", AHUData),
+    "chiller": ("Chiller", ChillerData),
+    "generator": ("Generator", GeneratorData)
+}
+
+def sample_records(device, rows):
+    """
+    Build request payloads for a device from the synthetic data generator
+    """
+    device_type, schema = DEVICE_SCHEMAS[device]
+    df = generate_device_data(device_type, num_samples=max(rows, 10000)).head(rows)
+    fields = list(schema.model_fields)
+    return [schema(**row).model_dump() for row in df[fields].to_dict(orient='records')]
+
+def bench_batch(device, rows, batch_size):
+    """
+    Compare rows/sec of the single-record endpoint against the batch endpoint
+    """
+    client = TestClient(app)
+    records = sample_records(device, rows)
+
+    start = time.perf_counter()
+    for record in records:
+        response = client.post(f"/predict/{device}", json=record)
+        response.raise_for_status()
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, len(records), batch_size):
+        response = client.post(f"/predict/{device}/batch", json=records[offset:offset + batch_size])
+        response.raise_for_status()
+    batch_elapsed = time.perf_counter() - start
+
+    print(f"{device} single: {rows / single_elapsed:,.0f} rows/sec ({single_elapsed:.2f}s)")
+    print(f"{device} batch({batch_size}): {rows / batch_elapsed:,.0f} rows/sec ({batch_elapsed:.2f}s)")
+    print(f"Speedup: {single_elapsed / batch_elapsed:.1f}x")
+
+async def run_concurrent_clients(device, records, clients):
+    """
+    Post every record to the single-record endpoint from `clients` concurrent tasks
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = list(reversed(records))
+
+        async def worker():
+            while queue:
+                response = await client.post(f"/predict/{device}", json=queue.pop())
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        return time.perf_counter() - start
+
+def bench_concurrent(device, rows, clients):
+    """
+    Compare single-record throughput with and without server-side micro-batching
+    """
+    records = sample_records(device, rows)
+    batcher = batchers[device]
+    configured_size = batcher.max_batch_size
+
+    async def run_both():
+        batcher.max_batch_size = 1
+        unbatched = await run_concurrent_clients(device, records, clients)
+        batcher.max_batch_size = configured_size
+        batched = await run_concurrent_clients(device, records, clients)
+        return unbatched, batched
+
+    unbatched, batched = asyncio.run(run_both())
+
+    print(f"{device} x{clients} clients, no micro-batching: {rows / unbatched:,.0f} rows/sec")
+    print(f"{device} x{clients} clients, micro-batch({configured_size}, {batcher.max_delay * 1000:.1f}ms): "
+          f"{rows / batched:,.0f} rows/sec")
+    print(f"Speedup: {unbatched / batched:.1f}x")
+
+def legacy_predict(model, record):
+    """
+    Original per-request path: one-row DataFrame, then predict and predict_proba
+    """
+    df = pd.DataFrame([record.model_dump()])
+    prediction = model.predict(df)[0]
+    probability = model.predict_proba(df)[0].max()
+    return {"fault_type": int(prediction), "probability": float(probability)}
+
+def latency_percentiles(func, model, records):
+    timings = []
+    for record in records:
+        start = time.perf_counter()
+        func(model, record)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(np.array(timings) * 1000, [50, 99])
+
+def bench_latency(device, rows):
+    """
+    Compare p50/p99 single-record latency of the DataFrame path and the fused NumPy path
+    """
+    _, schema = DEVICE_SCHEMAS[device]
+    model = fastapi_server.registry.get(device)
+    records = [schema(**record) for record in sample_records(device, rows)]
+
+    legacy = latency_percentiles(legacy_predict, model, records)
+    fused = latency_percentiles(lambda m, r: predict_records(m, [r])[0], model, records)
+
+    print(f"{device} DataFrame + predict + predict_proba: p50 {legacy[0]:.3f}ms  p99 {legacy[1]:.3f}ms")
+    print(f"{device} NumPy features + fused predict_proba: p50 {fused[0]:.3f}ms  p99 {fused[1]:.3f}ms")
+
+def bench_engine(device, rows, batch_size):
+    """
+    Check the compiled tree engine against LightGBM and compare scoring latency
+    """
+    _, schema = DEVICE_SCHEMAS[device]
+    model = fastapi_server.registry.get(device)
+    if isinstance(model, CompiledTreeEnsemble):
+        raise SystemExit("Unset FAST_INFERENCE/MODEL_STORE_MMAP so the LightGBM model is loaded for comparison")
+    start = time.perf_counter()
+    compiled = CompiledTreeEnsemble.from_lgbm(model)
+    print(f"{device} export: {(time.perf_counter() - start) * 1000:.0f}ms, {len(compiled.value):,} nodes")
+
+    records = [schema(**record) for record in sample_records(device, rows)]
+    features = fastapi_server.build_features(model, records)
+    print(f"{device} max |probability difference|: {verify(model, compiled, features):.3g}")
+
+    for name, engine in [("LightGBM", model), ("compiled", compiled)]:
+        single = latency_percentiles(lambda m, r: predict_records(m, [r])[0], engine, records)
+        start = time.perf_counter()
+        for offset in range(0, len(features), batch_size):
+            engine.predict_proba(features[offset:offset + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{device} {name}: single p50 {single[0]:.3f}ms  p99 {single[1]:.3f}ms  "
+              f"batch({batch_size}) {rows / elapsed:,.0f} rows/sec")
+
+def bench_wire(device, rows):
+    """
+    Per-record request parsing and response serialization cost of each wire format
+    """
+    import msgpack
+    import pyarrow as pa
+    _, schema = DEVICE_SCHEMAS[device]
+    records = sample_records(device, rows)
+    result = {"fault_type": 0, "probability": 0.99}
+
+    def per_record(func, payloads, count):
+        start = time.perf_counter()
+        for payload in payloads:
+            func(payload)
+        return (time.perf_counter() - start) / count * 1e6
+
+    def json_single(body):
+        data = schema(**json.loads(body))
+        json.dumps({**result, "data": data.model_dump()})
+
+    def msgpack_single(body):
+        schema(**msgpack.unpackb(body))
+        msgpack.packb(result)
+
+    def json_batch(body):
+        data = [schema(**item) for item in json.loads(body)]
+        json.dumps({"count": len(data), "results": [result] * len(data)})
+
+    def arrow_batch(body):
+        table = pa.ipc.open_stream(body).read_all()
+        np.column_stack([table.column(name).to_numpy().astype(np.float64) for name in schema.model_fields])
+        out = pa.table({"fault_type": np.zeros(table.num_rows, dtype=np.int64),
+                        "probability": np.full(table.num_rows, 0.99)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, out.schema) as writer:
+            writer.write_table(out)
+
+    table = pa.Table.from_pylist(records)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    timings = [
+        ("JSON single (with data echo)", per_record(json_single, [json.dumps(r) for r in records], rows)),
+        ("MessagePack single (no echo)", per_record(msgpack_single, [msgpack.packb(r) for r in records], rows)),
+        ("JSON batch", per_record(json_batch, [json.dumps(records)], rows)),
+        ("Arrow IPC batch", per_record(arrow_batch, [sink.getvalue().to_pybytes()], rows))
+    ]
+    for name, microseconds in timings:
+        print(f"{device} {name}: {microseconds:.2f}us/record")
+
+def legacy_inject_faults(data, faults, num_samples, fault_samples, rng):
+    """
+    Original per-row fault injection loop, kept as the baseline for bench_datagen
+    """
+    for fault_id in faults:
+        indices = rng.choice(num_samples, fault_samples, replace=False)
+        data['fault_type'][indices] = fault_id
+        for i in indices:
+            condition, updates = faults[fault_id]['conditions'](data, np.array([i]))
+            if condition[0]:
+                for k, v in updates.items():
+                    data[k][i] = v[0] if np.ndim(v) else v
+
+def timed_generation(device_type, rows, fault_samples, inject):
+    """
+    Generate a dataset with the given injection function; returns (frame, total, injection seconds)
+    """
+    injection = []
+
+    def timed_inject(*args):
+        start = time.perf_counter()
+        inject(*args)
+        injection.append(time.perf_counter() - start)
+
+    with mock.patch.object(data_genarator, 'inject_faults', timed_inject):
+        start = time.perf_counter()
+        df = generate_device_data(device_type, num_samples=rows, fault_samples=fault_samples)
+        total = time.perf_counter() - start
+    return df, total, sum(injection)
+
+def bench_datagen(device, row_counts, fault_ratio, legacy_max_rows):
+    """
+    Compare the per-row fault injection loop with vectorized injection, checking the output matches
+    """
+    device_type, _ = DEVICE_SCHEMAS[device]
+    for rows in row_counts:
+        fault_samples = int(rows * fault_ratio)
+        df, total, injection = timed_generation(device_type, rows, fault_samples, data_genarator.inject_faults)
+        print(f"{device} {rows:,} rows vectorized: injection {injection:.3f}s, total {total:.2f}s")
+        if rows > legacy_max_rows:
+            print(f"{device} {rows:,} rows legacy: skipped (--legacy-max-rows {legacy_max_rows:,})")
+            continue
+        legacy_df, legacy_total, legacy_injection = timed_generation(
+            device_type, rows, fault_samples, legacy_inject_faults)
+        columns = [column for column in df.columns if column != 'timestamp']
+        identical = df[columns].equals(legacy_df[columns])
+        del legacy_df
+        print(f"{device} {rows:,} rows legacy: injection {legacy_injection:.3f}s, total {legacy_total:.2f}s")
+        print(f"Injection speedup: {legacy_injection / injection:.0f}x, "
+              f"end-to-end: {legacy_total / total:.1f}x, identical output: {identical}")
+
+# Dashboard machine shown for each device
+DEVICE_MACHINES = {
+    "ahu": "Air Handling Unit",
+    "chiller": "Chiller",
+    "generator": "Generator"
+}
+
+def time_trend_updates(device, readings, incremental, interval):
+    """
+    Feed readings through TrendAnalyzer.update_trends on an Agg canvas; returns
+    per-update milliseconds and the number of full redraws
+    """
+    machine = DEVICE_MACHINES[device]
+    analyzer = TrendAnalyzer(incremental=incremental)
+    fig, axes = analyzer.create_trend_figure(machine)
+    canvas = FigureCanvasAgg(fig)
+    analyzer.attach_trend_canvas(machine, canvas, axes)
+    full_draws = []
+    canvas.mpl_connect('draw_event', lambda event: full_draws.append(1))
+    start = datetime.now()
+    timings = []
+    for index, reading in enumerate(readings):
+        began = time.perf_counter()
+        analyzer.update_trends(machine, 0, data=reading,
+                               timestamp=start + timedelta(seconds=index * interval))
+        timings.append((time.perf_counter() - began) * 1000)
+    return np.array(timings), len(full_draws)
+
+def bench_trends(device, updates, interval):
+    """
+    Compare clearing and replotting every trend axis with blitting persistent artists
+    """
+    device_type, _ = DEVICE_SCHEMAS[device]
+    readings = generate_random_fault_data_bulk(device_type.upper(), updates).to_dict(orient='records')
+    for name, incremental in [("replot", False), ("blit", True)]:
+        timings, full_draws = time_trend_updates(device, readings, incremental, interval)
+        p50, p95 = np.percentile(timings, [50, 95])
+        print(f"{device} trends {name}: mean {timings.mean():.2f}ms, p50 {p50:.2f}ms, p95 {p95:.2f}ms, "
+              f"full redraws {full_draws}/{updates}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GENESIS performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="single-record vs batch endpoint throughput")
+    batch_parser.add_argument("--device", choices=list(DEVICE_SCHEMAS), default="ahu")
+    batch_parser.add_argument("--rows", type=int, default=2000)
+    batch_parser.add_argument("--batch-size", type=int, default=500)
+
+    concurrent_parser = subparsers.add_parser("concurrent", help="micro-batching under concurrent single-record clients")
+    concurrent_parser.add_argument("--device", choices=list(DEVICE_SCHEMAS), default="ahu")
+    concurrent_parser.add_argument("--rows", type=int, default=2000)
+    concurrent_parser.add_argument("--clients", type=int, default=500)
+
+    latency_parser = subparsers.add_parser("latency", help="per-record latency of the feature/inference path")
+    latency_parser.add_argument("--device", choices=list(DEVICE_SCHEMAS), default="ahu")
+    latency_parser.add_argument("--rows", type=int, default=1000)
+
+    engine_parser = subparsers.add_parser("engine", help="compiled tree engine vs LightGBM")
+    engine_parser.add_argument("--device", choices=list(DEVICE_SCHEMAS), default="ahu")
+    engine_parser.add_argument("--rows", type=int, default=1000)
+    engine_parser.add_argument("--batch-size", type=int, default=64)
+
+    wire_parser = subparsers.add_parser("wire", help="parse/serialize cost of JSON, MessagePack and Arrow")
+    wire_parser.add_argument("--device", choices=list(DEVICE_SCHEMAS), default="ahu")
+    wire_parser.add_argument("--rows", type=int, default=10000)
+
+    datagen_parser = subparsers.add_parser("datagen", help="vectorized vs per-row fault injection")
+    datagen_parser.add_argument("--device", choices=list(DEVICE_SCHEMAS), default="ahu")
+    datagen_parser.add_argument("--rows", type=lambda value: [int(rows) for rows in value.split(",")],
+                                default=[10_000, 1_000_000, 10_000_000])
+    datagen_parser.add_argument("--fault-ratio", type=float, default=0.5,
+                                help="fault_samples per class as a fraction of rows (default matches 5000/10000)")
+    datagen_parser.add_argument("--legacy-max-rows", type=int, default=10_000_000)
+
+    trends_parser = subparsers.add_parser("trends", help="trend graph redraw cost on a headless Agg canvas")
+    trends_parser.add_argument("--device", choices=list(DEVICE_SCHEMAS), default="ahu")
+    trends_parser.add_argument("--updates", type=int, default=200)
+    trends_parser.add_argument("--interval", type=float, default=5.0, help="simulated seconds between readings")
+
+    args = parser.parse_args()
+    if args.command == "batch":
+        bench_batch(args.device, args.rows, args.batch_size)
+    elif args.command == "concurrent":
+        bench_concurrent(args.device, args.rows, args.clients)
+    elif args.command == "latency":
+        bench_latency(args.device, args.rows)
+    elif args.command == "engine":
+        bench_engine(args.device, args.rows, args.batch_size)
+    elif args.command == "wire":
+        bench_wire(args.device, args.rows)
+    elif args.command == "datagen":
+        bench_datagen(args.device, args.rows, args.fault_ratio, args.legacy_max_rows)
+    elif args.command == "trends":
+        bench_trends(args.device, args.updates, args.interval)
@@ -0,0 +1,127 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Parquet/Feather support is optional; CSV keeps working without pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNAR_EXTENSIONS = {'.parquet': 'parquet', '.feather': 'feather'}
+
+# On/off flags and class labels stored as int8; every other integer column is int32
+INT8_COLUMNS = {'fault_type', 'prediction', 'cooling_state', 'electric_reheat_state', 'flow_switch'}
+
+def columnar_format(path):
+    """
+    'parquet' or 'feather' for a columnar file name, None otherwise
+    """
+    return COLUMNAR_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet/Feather support requires the pyarrow package")
+
+def compact_frame(df):
+    """
+    Narrow numeric columns for storage: floats to float32, integers to int8
+    for known flag/label columns and int32 otherwise. Types depend on the
+    column name only, so every chunk and shard of a dataset gets the same schema.
+    """
+    columns = {}
+    for name, column in df.items():
+        if pd.api.types.is_bool_dtype(column):
+            columns[name] = column
+        elif pd.api.types.is_float_dtype(column):
+            columns[name] = column.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(column):
+            dtype = np.int8 if name in INT8_COLUMNS else np.int32
+            info = np.iinfo(dtype)
+            if not column.empty and (column.min() < info.min or column.max() > info.max):
+                raise ValueError(f"Column {name} has values outside the {np.dtype(dtype).name} range")
+            columns[name] = column.astype(dtype)
+        else:
+            columns[name] = column
+    return pd.DataFrame(columns, index=df.index)
+
+class ColumnarWriter:
+    """
+    Append DataFrame chunks to one compressed Parquet or Feather (Arrow IPC) file.
+    The schema is fixed by the first chunk; later chunks are cast to it.
+    """
+    def __init__(self, path, compression='zstd'):
+        require_pyarrow()
+        self.path = path
+        self.format = columnar_format(path)
+        if self.format is None:
+            raise ValueError(f"Not a Parquet or Feather file name: {path}")
+        self.compression = compression
+        self.schema = None
+        self.sink = None
+        self.writer = None
+
+    def write(self, df):
+        table = pa.Table.from_pandas(compact_frame(df), preserve_index=False)
+        if self.writer is None:
+            self.schema = table.schema.remove_metadata()
+            if self.format == 'parquet':
+                self.writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+            else:
+                self.sink = pa.OSFile(self.path, 'wb')
+                options = pa.ipc.IpcWriteOptions(compression=self.compression)
+                self.writer = pa.ipc.new_file(self.sink, self.schema, options=options)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_columnar(df, path, compression='zstd'):
+    """
+    Write one DataFrame as a compressed Parquet or Feather file
+    """
+    with ColumnarWriter(path, compression) as writer:
+        writer.write(df)
+
+def read_columnar(path, columns=None):
+    """
+    Load a Parquet or Feather file (or a directory of Parquet shards), reading only `columns`
+    """
+    require_pyarrow()
+    if os.path.isdir(path) or columnar_format(path) == 'parquet':
+        table = pq.read_table(path, columns=columns)
+    elif columnar_format(path) == 'feather':
+        table = feather.read_table(path, columns=columns, memory_map=True)
+    else:
+        raise ValueError(f"Not a Parquet or Feather file name: {path}")
+    return table.to_pandas()
+
+def iter_columnar(path, chunk_size=100000, columns=None):
+    """
+    Stream a Parquet or Feather file as DataFrames of at most chunk_size rows
+    """
+    require_pyarrow()
+    if columnar_format(path) == 'parquet':
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif columnar_format(path) == 'feather':
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        for index in range(reader.num_record_batches):
+            batch = reader.get_batch(index)
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size).to_pandas()
+    else:
+        raise ValueError(f"Not a Parquet or Feather file name: {path}")
@@ -1,31 +1,62 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from columnar import ColumnarWriter, columnar_format
 
-def generate_device_data(device_type, num_samples=10000):
-    np.random.seed(42)
-    base_params = {'timestamp': [datetime.now() - timedelta(minutes=i) for i in range(num_samples)]}
-    
+# Optional Arrow output for chunked generation
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+def randint(rng, low, high, size):
+    """
+    Integers in [low, high) from either a legacy RandomState or a numpy Generator
+    """
+    if hasattr(rng, 'integers'):
+        return rng.integers(low, high, size)
+    return rng.randint(low, high, size)
+
+def inject_faults(data, faults, num_samples, fault_samples, rng):
+    """
+    Label fault_samples random rows per fault and apply its updates where the condition holds.
+    Each fault's conditions take an index array and return a boolean mask plus
+    per-row (or scalar) updates, so every fault is applied with a few array operations.
+    """
+    for fault_id in faults:
+        indices = rng.choice(num_samples, fault_samples, replace=False)
+        data['fault_type'][indices] = fault_id
+        condition, updates = faults[fault_id]['conditions'](data, indices)
+        hit = indices[condition]
+        for k, v in updates.items():
+            data[k][hit] = v[condition] if np.ndim(v) else v
+
+def build_device_data(device_type, num_samples, fault_samples, rng):
+    """
+    Sensor columns and fault labels for one block of rows, drawn from rng
+    """
     if device_type == "AHU":
         data = {
             # AHU Parameters from Client List
-            'supply_air_temp': np.random.normal(18, 1, num_samples),
-            'return_air_temp': np.random.normal(23, 1, num_samples),
-            'room_air_temp': np.random.normal(23, 1.5, num_samples),
-            'return_air_humidity': np.random.uniform(40, 60, num_samples),
-            'fan_speed': np.random.randint(40, 100, num_samples),
-            'cooling_state': np.random.choice([0, 1], num_samples, p=[0.7, 0.3]),
-            'electric_reheat_state': np.random.choice([0, 1], num_samples, p=[0.9, 0.1]),
-            'filter_dp': np.random.uniform(50, 250, num_samples),
-            'cool_water_valve': np.random.uniform(0, 100, num_samples),
-            'hot_water_valve': np.random.uniform(0, 100, num_samples),
-            'outside_air_damper': np.random.uniform(20, 80, num_samples),
+            'supply_air_temp': rng.normal(18, 1, num_samples),
+            'return_air_temp': rng.normal(23, 1, num_samples),
+            'room_air_temp': rng.normal(23, 1.5, num_samples),
+            'return_air_humidity': rng.uniform(40, 60, num_samples),
+            'fan_speed': randint(rng, 40, 100, num_samples),
+            'cooling_state': rng.choice([0, 1], num_samples, p=[0.7, 0.3]),
+            'electric_reheat_state': rng.choice([0, 1], num_samples, p=[0.9, 0.1]),
+            'filter_dp': rng.uniform(50, 250, num_samples),
+            'cool_water_valve': rng.uniform(0, 100, num_samples),
+            'hot_water_valve': rng.uniform(0, 100, num_samples),
+            'outside_air_damper': rng.uniform(20, 80, num_samples),
             'supply_air_setpoint': np.full(num_samples, 18),
             'fault_type': np.zeros(num_samples, dtype=int)
         }
         
         # AHU Fault Injection (Client's Thresholds)
-        fault_samples = 5000
         faults = {
             1: {'name': 'Fan Fault', 'conditions': lambda d, i: (
                 d['fan_speed'][i] < 10,
@@ -33,39 +64,32 @@ def generate_device_data(device_type, num_samples=10000):
             )},
             2: {'name': 'Filter Dirty', 'conditions': lambda d, i: (
                 d['filter_dp'][i] > 300,
-                {'filter_dp': np.random.uniform(350, 500), 'fan_speed': d['fan_speed'][i] * 0.6}
+                {'filter_dp': rng.uniform(350, 500, len(i)), 'fan_speed': d['fan_speed'][i] * 0.6}
             )},
             3: {'name': 'Coil Fault', 'conditions': lambda d, i: (
-                d['cooling_state'][i] == 1 and d['supply_air_temp'][i] > 20,
+                (d['cooling_state'][i] == 1) & (d['supply_air_temp'][i] > 20),
                 {'cool_water_valve': 0, 'supply_air_temp': d['supply_air_temp'][i] + 3}
             )},
             4: {'name': 'Damper Fault', 'conditions': lambda d, i: (
-                d['outside_air_damper'][i] in [0, 100],
-                {'outside_air_damper': 100 if np.random.rand() > 0.5 else 0}
+                np.isin(d['outside_air_damper'][i], [0, 100]),
+                {'outside_air_damper': np.where(rng.random(len(i)) > 0.5, 100, 0)}
             )}
         }
         
         # Inject faults with balanced classes
-        for fault_id in faults:
-            indices = np.random.choice(num_samples, fault_samples, replace=False)
-            data['fault_type'][indices] = fault_id
-            for i in indices:
-                condition, updates = faults[fault_id]['conditions'](data, i)
-                if condition:
-                    for k, v in updates.items():
-                        data[k][i] = v
+        inject_faults(data, faults, num_samples, fault_samples, rng)
 
     elif device_type == "Chiller":
         data = {
-            'chill_water_outlet': np.random.normal(6, 0.5, num_samples),
-            'chill_water_inlet': np.random.normal(10, 1, num_samples),
-            'condenser_pressure': np.random.normal(4.5, 0.3, num_samples),
-            'differential_pressure': np.random.normal(15, 2, num_samples),
-            'supply_water_temp': np.random.normal(45, 1.5, num_samples),
-            'cooling_tower_fan': np.random.choice([0, 1], num_samples, p=[0.3, 0.7]),
-            'condenser_pump': np.random.choice([0, 1], num_samples, p=[0.2, 0.8]),
-            'return_condenser_valve': np.random.choice([0, 1], num_samples, p=[0.1, 0.9]),
-            'flow_switch': np.random.choice([0, 1], num_samples, p=[0.95, 0.05]),
+            'chill_water_outlet': rng.normal(6, 0.5, num_samples),
+            'chill_water_inlet': rng.normal(10, 1, num_samples),
+            'condenser_pressure': rng.normal(4.5, 0.3, num_samples),
+            'differential_pressure': rng.normal(15, 2, num_samples),
+            'supply_water_temp': rng.normal(45, 1.5, num_samples),
+            'cooling_tower_fan': rng.choice([0, 1], num_samples, p=[0.3, 0.7]),
+            'condenser_pump': rng.choice([0, 1], num_samples, p=[0.2, 0.8]),
+            'return_condenser_valve': rng.choice([0, 1], num_samples, p=[0.1, 0.9]),
+            'flow_switch': rng.choice([0, 1], num_samples, p=[0.95, 0.05]),
             'chill_water_outlet_setpoint': np.full(num_samples, 6.0),
             'chill_water_inlet_setpoint': np.full(num_samples, 10.0),
             'condenser_pressure_setpoint': np.full(num_samples, 4.5),
@@ -79,7 +103,6 @@ def generate_device_data(device_type, num_samples=10000):
         }
         
         # Chiller Fault Injection (Client's Thresholds)
-        fault_samples = 5000
         faults = {
             1: {'name': 'Low Refrigerant', 'conditions': lambda d, i: (
                 d['condenser_pressure'][i] < 3.0,
@@ -100,27 +123,20 @@ def generate_device_data(device_type, num_samples=10000):
         }
         
         # Inject faults with balanced classes
-        for fault_id in faults:
-            indices = np.random.choice(num_samples, fault_samples, replace=False)
-            data['fault_type'][indices] = fault_id
-            for i in indices:
-                condition, updates = faults[fault_id]['conditions'](data, i)
-                if condition:
-                    for k, v in updates.items():
-                        data[k][i] = v
+        inject_faults(data, faults, num_samples, fault_samples, rng)
 
     elif device_type == "Generator":
         data = {
-            'oil_pressure': np.random.normal(2.0, 0.2, num_samples),
-            'coolant_temp': np.random.normal(85, 5, num_samples),
-            'battery_voltage': np.random.normal(24, 0.3, num_samples),
-            'phase1_voltage': np.random.normal(230, 3, num_samples),
-            'phase2_voltage': np.random.normal(230, 3, num_samples),
-            'phase3_voltage': np.random.normal(230, 3, num_samples),
-            'frequency': np.random.normal(50, 0.1, num_samples),
-            'load_percent': np.random.uniform(40, 80, num_samples),
-            'run_hours': np.random.randint(0, 20000, num_samples),
-            'fuel_level': np.random.uniform(30, 100, num_samples),
+            'oil_pressure': rng.normal(2.0, 0.2, num_samples),
+            'coolant_temp': rng.normal(85, 5, num_samples),
+            'battery_voltage': rng.normal(24, 0.3, num_samples),
+            'phase1_voltage': rng.normal(230, 3, num_samples),
+            'phase2_voltage': rng.normal(230, 3, num_samples),
+            'phase3_voltage': rng.normal(230, 3, num_samples),
+            'frequency': rng.normal(50, 0.1, num_samples),
+            'load_percent': rng.uniform(40, 80, num_samples),
+            'run_hours': randint(rng, 0, 20000, num_samples),
+            'fuel_level': rng.uniform(30, 100, num_samples),
             'oil_pressure_setpoint': np.full(num_samples, 2.0),
             'coolant_temp_setpoint': np.full(num_samples, 85.0),
             'battery_voltage_setpoint': np.full(num_samples, 24.0),
@@ -135,7 +151,6 @@ def generate_device_data(device_type, num_samples=10000):
         }
         
         # Generator Fault Injection (Client's Thresholds)
-        fault_samples = 5000
         faults = {
             1: {'name': 'Low Oil Pressure', 'conditions': lambda d, i: (
                 d['oil_pressure'][i] < 1.03,
@@ -146,7 +161,7 @@ def generate_device_data(device_type, num_samples=10000):
                 {'coolant_temp': 125, 'oil_pressure': d['oil_pressure'][i] - 0.5}
             )},
             3: {'name': 'Voltage Imbalance', 'conditions': lambda d, i: (
-                abs(d['phase1_voltage'][i] - d['phase2_voltage'][i]) > 15,
+                np.abs(d['phase1_voltage'][i] - d['phase2_voltage'][i]) > 15,
                 {'phase1_voltage': 210, 'phase2_voltage': 245, 'frequency': 49}
             )},
             4: {'name': 'Fuel System Fault', 'conditions': lambda d, i: (
@@ -156,23 +171,130 @@ def generate_device_data(device_type, num_samples=10000):
         }
         
         # Inject faults with balanced classes
-        for fault_id in faults:
-            indices = np.random.choice(num_samples, fault_samples, replace=False)
-            data['fault_type'][indices] = fault_id
-            for i in indices:
-                condition, updates = faults[fault_id]['conditions'](data, i)
-                if condition:
-                    for k, v in updates.items():
-                        data[k][i] = v
-
-    data.update(base_params)
+        inject_faults(data, faults, num_samples, fault_samples, rng)
+
+    else:
+        raise ValueError(f"Unknown device type: {device_type}")
+
+    return data
+
+def timestamps(start, offset, count):
+    """
+    One reading per minute counting back from start, for rows offset..offset+count
+    """
+    minutes = np.arange(offset, offset + count, dtype=np.int64)
+    return (start - minutes * np.timedelta64(1, 'm')).astype('datetime64[ns]')
+
+def generate_device_data(device_type, num_samples=10000, fault_samples=5000):
+    rng = np.random.RandomState(42)
+    data = build_device_data(device_type, num_samples, fault_samples, rng)
+    data['timestamp'] = timestamps(np.datetime64(datetime.now(), 'us'), 0, num_samples)
     return pd.DataFrame(data)
 
+def generate_device_chunks(device_type, num_samples, chunk_size=100000, fault_ratio=0.5,
+                           seed=42, start_time=None, as_arrow=False, rng=None, offset=0):
+    """
+    Yield a dataset as DataFrames (or Arrow record batches) of at most chunk_size rows.
+    Timestamps continue one minute apart across chunks, and each chunk labels
+    fault_ratio of its rows with every fault class, so any prefix of the stream
+    has the same class balance. Memory use depends on chunk_size only.
+    offset shifts the timestamps when the rows are one shard of a larger set.
+    """
+    if as_arrow and pa is None:
+        raise ImportError("Arrow output requires the pyarrow package")
+    rng = rng if rng is not None else np.random.RandomState(seed)
+    start = np.datetime64(start_time or datetime.now(), 'us')
+    for row in range(0, num_samples, chunk_size):
+        count = min(chunk_size, num_samples - row)
+        data = build_device_data(device_type, count, int(round(count * fault_ratio)), rng)
+        data['timestamp'] = timestamps(start, offset + row, count)
+        yield pa.RecordBatch.from_pydict(data) if as_arrow else pd.DataFrame(data)
+
+def write_chunks(chunks, path):
+    """
+    Append chunks to one CSV, Parquet or Feather file (chosen by extension);
+    returns the row count per fault type
+    """
+    writer = ColumnarWriter(path) if columnar_format(path) else None
+    counts = np.zeros(0, dtype=np.int64)
+    for index, chunk in enumerate(chunks):
+        if writer is not None:
+            writer.write(chunk)
+        else:
+            chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        chunk_counts = np.bincount(chunk['fault_type'].to_numpy())
+        counts = np.pad(counts, (0, max(0, len(chunk_counts) - len(counts))))
+        counts[:len(chunk_counts)] += chunk_counts
+    if writer is not None:
+        writer.close()
+    return counts
+
+def generate_shard(device_type, offset, num_samples, seed_sequence, path, chunk_size, fault_ratio, start_time):
+    """
+    Write one shard with its own Generator; runs in a worker process
+    """
+    rng = np.random.default_rng(seed_sequence)
+    chunks = generate_device_chunks(device_type, num_samples, chunk_size, fault_ratio,
+                                    start_time=start_time, rng=rng, offset=offset)
+    return path, write_chunks(chunks, path)
+
+def generate_device_parallel(device_type, num_samples, output_dir, shard_size=1000000, workers=None,
+                             chunk_size=100000, fault_ratio=0.5, seed=42, start_time=None, file_format='csv'):
+    """
+    Generate num_samples rows as shard files (part-00000.<file_format>, ...) under output_dir/<device>,
+    using a process pool. Shard boundaries and seeds depend only on shard_size and seed
+    (one SeedSequence child per shard), so the files are identical for any worker count.
+    Returns the shard paths and the row count per fault type.
+    """
+    directory = os.path.join(output_dir, device_type.lower())
+    os.makedirs(directory, exist_ok=True)
+    start = np.datetime64(start_time or datetime.now(), 'us')
+    offsets = range(0, num_samples, shard_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(offsets))
+    shards = [
+        (device_type, offset, min(shard_size, num_samples - offset), seed_sequence,
+         os.path.join(directory, f"part-{index:05d}.{file_format}"), chunk_size, fault_ratio, start)
+        for index, (offset, seed_sequence) in enumerate(zip(offsets, seeds))
+    ]
+    paths, counts = [], np.zeros(0, dtype=np.int64)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, shard_counts in executor.map(generate_shard, *zip(*shards)):
+            paths.append(path)
+            counts = np.pad(counts, (0, max(0, len(shard_counts) - len(counts))))
+            counts[:len(shard_counts)] += shard_counts
+    return paths, counts
+
 if __name__ == "__main__":
-    devices = ["AHU", "Chiller", "Generator"]
+    parser = argparse.ArgumentParser(description="Generate synthetic device data with labelled faults")
+    parser.add_argument("--device", choices=["AHU", "Chiller", "Generator"], action="append",
+                        help="device type to generate (repeatable, default: all)")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=100000,
+                        help="rows generated and written at a time; bounds memory use")
+    parser.add_argument("--fault-ratio", type=float, default=0.5,
+                        help="share of rows labelled with each fault class")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["csv", "parquet", "feather"], default="csv",
+                        help="parquet/feather write compressed float32/int8 columns (needs pyarrow)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="generate shards in this many processes (0 writes one file serially)")
+    parser.add_argument("--shard-size", type=int, default=1000000)
+    parser.add_argument("--output-dir", default="generated_data",
+                        help="root directory for shard files when --workers is set")
+    args = parser.parse_args()
+    if args.rows < 1:
+        parser.error("--rows must be at least 1")
+
+    devices = args.device or ["AHU", "Chiller", "Generator"]
     for device in devices:
-        df = generate_device_data(device)
-        df.to_csv(f'{device.lower()}_data.csv', index=False)
+        if args.workers > 0:
+            paths, counts = generate_device_parallel(
+                device, args.rows, args.output_dir, args.shard_size, args.workers,
+                args.chunk_size, args.fault_ratio, args.seed, file_format=args.format)
+            print(f"Wrote {len(paths)} shards to {os.path.dirname(paths[0])}")
+        else:
+            chunks = generate_device_chunks(device, args.rows, args.chunk_size, args.fault_ratio, args.seed)
+            counts = write_chunks(chunks, f'{device.lower()}_data.{args.format}')
         print(f"{device} Data Summary:")
-        print(df['fault_type'].value_counts().sort_index())
-        print("\n" + "="*50 + "\n")
\ No newline at end of file
+        print(pd.Series(counts, name='count').rename_axis('fault_type'))
+        print("\n" + "="*50 + "\n")
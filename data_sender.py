@@ -1,21 +1,42 @@
 import requests
 import time
+import argparse
+import asyncio
+import os
+import random
 from data_genarator import generate_device_data
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+# Optional client for the asyncio fleet simulator
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
 # API endpoints (local FastAPI server)
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 API_ENDPOINTS = {
-    "AHU": "http://localhost:8000/predict/ahu",
-    "Chiller": "http://localhost:8000/predict/chiller",
-    "Generator": "http://localhost:8000/predict/generator"
+    "AHU": f"{API_BASE_URL}/predict/ahu",
+    "CHILLER": f"{API_BASE_URL}/predict/chiller",
+    "GENERATOR": f"{API_BASE_URL}/predict/generator"
 }
+DEVICE_TYPES = ["AHU", "CHILLER", "GENERATOR"]
+
+# One pooled connection for the synchronous sender instead of a new one per reading
+session = requests.Session()
 
 def generate_random_fault_data(device_type):
     """
     Generate a single record with possible fault
     """
+    return pd.DataFrame([generate_random_fault_record(device_type)])
+
+def generate_random_fault_record(device_type):
+    """
+    Generate a single reading with possible fault as a JSON-ready dict
+    """
     try:
         if device_type == "AHU":
             data = {
@@ -140,32 +161,158 @@ def generate_random_fault_data(device_type):
         else:
             raise ValueError(f"Unknown device type: {device_type}")
         
-        # Create DataFrame with explicit type conversion
-        df = pd.DataFrame([data])
-        print(f"Generated data for {device_type}:")
-        print(df.dtypes)
-        return df
+        # Plain Python numbers so the reading serializes as JSON
+        return {k: v.item() if isinstance(v, np.generic) else v for k, v in data.items()}
     
     except Exception as e:
         print(f"Error generating data for {device_type}: {str(e)}")
         raise
 
+def generate_random_fault_data_bulk(device_type, n, as_frame=True):
+    """
+    Generate n readings in one vectorized pass, with the same 20% fault injection
+    as generate_random_fault_data; returns a DataFrame or a dict of arrays
+    """
+    if device_type == "AHU":
+        data = {
+            'supply_air_temp': np.random.normal(18, 1, n),
+            'supply_air_setpoint': np.full(n, 18.0),
+            'return_air_temp': np.random.normal(23, 1, n),
+            'return_air_setpoint': np.full(n, 24.0),
+            'room_air_temp': np.random.normal(23, 1.5, n),
+            'room_air_setpoint': np.full(n, 23.0),
+            'return_air_humidity': np.random.uniform(40, 60, n),
+            'return_air_humidity_setpoint': np.full(n, 50.0),
+            'fan_speed': np.random.randint(40, 100, n).astype(float),
+            'fan_speed_setpoint': np.full(n, 75.0),
+            'cooling_state': np.random.randint(0, 2, n),
+            'cooling_state_setpoint': np.full(n, 0.5),
+            'electric_reheat_state': np.random.randint(0, 2, n),
+            'electric_reheat_state_setpoint': np.full(n, 0.5),
+            'filter_dp': np.random.uniform(50, 250, n),
+            'filter_dp_setpoint': np.full(n, 150.0),
+            'cool_water_valve': np.random.uniform(0, 100, n),
+            'cool_water_valve_setpoint': np.full(n, 50.0),
+            'hot_water_valve': np.random.uniform(0, 100, n),
+            'hot_water_valve_setpoint': np.full(n, 50.0),
+            'outside_air_damper': np.random.uniform(20, 80, n),
+            'outside_air_damper_setpoint': np.full(n, 50.0)
+        }
+        fault_type = random_fault_types(n)
+
+        fault = fault_type == 1  # Fan Fault
+        data['fan_speed'][fault] = 0
+        data['supply_air_temp'][fault] += 5
+        fault = fault_type == 2  # Filter Dirty
+        data['filter_dp'][fault] = np.random.uniform(350, 500, fault.sum())
+        data['fan_speed'][fault] *= 0.6
+        fault = fault_type == 3  # Coil Fault
+        data['cool_water_valve'][fault] = 0
+        data['supply_air_temp'][fault] += 3
+        fault = fault_type == 4  # Damper Fault
+        data['outside_air_damper'][fault] = np.where(np.random.random(fault.sum()) > 0.5, 100, 0)
+
+    elif device_type == "CHILLER":
+        data = {
+            'chill_water_outlet': np.random.normal(6, 0.5, n),
+            'chill_water_outlet_setpoint': np.full(n, 6.0),
+            'chill_water_inlet': np.random.normal(10, 1, n),
+            'chill_water_inlet_setpoint': np.full(n, 10.0),
+            'condenser_pressure': np.random.normal(4.5, 0.3, n),
+            'condenser_pressure_setpoint': np.full(n, 4.5),
+            'differential_pressure': np.random.normal(15, 2, n),
+            'differential_pressure_setpoint': np.full(n, 15.0),
+            'supply_water_temp': np.random.normal(45, 1.5, n),
+            'supply_water_temp_setpoint': np.full(n, 45.0),
+            'cooling_tower_fan': np.random.randint(0, 2, n),
+            'cooling_tower_fan_setpoint': np.full(n, 0.5),
+            'condenser_pump': np.random.randint(0, 2, n),
+            'condenser_pump_setpoint': np.full(n, 0.5),
+            'return_condenser_valve': np.random.randint(0, 2, n),
+            'return_condenser_valve_setpoint': np.full(n, 0.5),
+            'flow_switch': np.random.randint(0, 2, n),
+            'flow_switch_setpoint': np.full(n, 0.5)
+        }
+        fault_type = random_fault_types(n)
+
+        fault = fault_type == 1  # Low Refrigerant
+        data['condenser_pressure'][fault] = 2.5
+        data['chill_water_outlet'][fault] += 2
+        fault = fault_type == 2  # Condenser Fault
+        data['differential_pressure'][fault] = 25
+        data['condenser_pressure'][fault] += 1.5
+        fault = fault_type == 3  # Flow Switch Fault
+        data['flow_switch'][fault] = 0
+        data['chill_water_inlet'][fault] += 4
+        fault = fault_type == 4  # Pump Failure
+        data['condenser_pump'][fault] = 0
+        data['supply_water_temp'][fault] += 5
+
+    elif device_type == "GENERATOR":
+        data = {
+            'oil_pressure': np.random.normal(2.0, 0.2, n),
+            'oil_pressure_setpoint': np.full(n, 2.0),
+            'coolant_temp': np.random.normal(85, 5, n),
+            'coolant_temp_setpoint': np.full(n, 85.0),
+            'battery_voltage': np.random.normal(24, 0.3, n),
+            'battery_voltage_setpoint': np.full(n, 24.0),
+            'phase1_voltage': np.random.normal(230, 3, n),
+            'phase1_voltage_setpoint': np.full(n, 230.0),
+            'phase2_voltage': np.random.normal(230, 3, n),
+            'phase2_voltage_setpoint': np.full(n, 230.0),
+            'phase3_voltage': np.random.normal(230, 3, n),
+            'phase3_voltage_setpoint': np.full(n, 230.0),
+            'frequency': np.random.normal(50, 0.1, n),
+            'frequency_setpoint': np.full(n, 50.0),
+            'load_percent': np.random.uniform(40, 80, n),
+            'load_percent_setpoint': np.full(n, 60.0),
+            'run_hours': np.random.randint(0, 20000, n),
+            'run_hours_setpoint': np.full(n, 10000.0),
+            'fuel_level': np.random.uniform(30, 100, n),
+            'fuel_level_setpoint': np.full(n, 65.0)
+        }
+        fault_type = random_fault_types(n)
+
+        fault = fault_type == 1  # Low Oil Pressure
+        data['oil_pressure'][fault] = 0.8
+        data['coolant_temp'][fault] += 10
+        fault = fault_type == 2  # Overheating
+        data['coolant_temp'][fault] = 125
+        data['oil_pressure'][fault] -= 0.5
+        fault = fault_type == 3  # Voltage Imbalance
+        data['phase1_voltage'][fault] = 210
+        data['phase2_voltage'][fault] = 245
+        data['frequency'][fault] = 49
+        fault = fault_type == 4  # Fuel System Fault
+        data['fuel_level'][fault] = 0
+        data['load_percent'][fault] = 0
+
+    else:
+        raise ValueError(f"Unknown device type: {device_type}")
+
+    return pd.DataFrame(data) if as_frame else data
+
+def random_fault_types(n):
+    """
+    Fault type per reading: 0 for 80% of readings, otherwise uniform over 1-4
+    """
+    return np.where(np.random.random(n) < 0.2, np.random.randint(1, 5, n), 0)
+
 def send_device_data(device_type, data):
     """
     Send data to respective API endpoint and get prediction
     """
     try:
-        response = requests.post(
+        response = session.post(
             API_ENDPOINTS[device_type],
+            params={"include_data": "false"},
             json=data.to_dict(orient='records')[0]
         )
         
         if response.status_code == 200:
             result = response.json()
-            print(f"\n{device_type} Prediction:")
-            print(f"Fault Type: {result['fault_type']}")
-            print(f"Probability: {result['probability']:.2f}")
-            print(f"Data: {data.to_dict(orient='records')[0]}")
+            print(f"{device_type} Prediction: fault type {result['fault_type']} "
+                  f"(probability {result['probability']:.2f})")
         else:
             print(f"Error: {response.status_code}")
             
@@ -175,11 +322,9 @@ def send_device_data(device_type, data):
 def main():
     print("Starting data sender...")
     while True:
-        for device_type in ["AHU", "CHILLER", "GENERATOR"]:
+        for device_type in DEVICE_TYPES:
             try:
                 data = generate_random_fault_data(device_type)
-                print(f"\n{device_type} Data Generated:")
-                print(data.to_dict(orient='records')[0])
                 send_device_data(device_type, data)
             except Exception as e:
                 print(f"Error with {device_type}: {str(e)}")
@@ -187,8 +332,95 @@ def main():
         print("\n" + "="*50 + "\n")
         time.sleep(5)
 
+async def post_with_retry(client, semaphore, url, payload, retries, backoff, stats):
+    """
+    POST with exponential backoff and jitter on connection errors, 429 and 5xx responses.
+    The semaphore is only held while a request is in flight, not while backing off.
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                response = await client.post(url, json=payload)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            error = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            error = str(e) or type(e).__name__
+        if attempt < retries:
+            stats["retries"] += 1
+            await asyncio.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+    raise RuntimeError(f"Giving up after {retries + 1} attempts: {error}")
+
+async def simulate_fleet(devices=1000, interval=5.0, duration=60.0, concurrency=100, batch_size=0,
+                         retries=3, backoff=0.2, base_url=API_BASE_URL):
+    """
+    Simulate a fleet of devices, split evenly across device types, that each send one
+    reading per interval. Readings go out over a pooled keep-alive client with at most
+    `concurrency` requests in flight; with batch_size > 0 each tick's readings are
+    posted to the batch endpoints in groups of batch_size.
+    """
+    if httpx is None:
+        raise ImportError("The async sender requires the httpx package")
+    stats = {"sent": 0, "failed": 0, "retries": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=10.0) as client:
+        async def send(device_type, payload, count):
+            url = f"/predict/{device_type.lower()}/batch" if batch_size > 0 \
+                else f"/predict/{device_type.lower()}?include_data=false"
+            try:
+                response = await post_with_retry(client, semaphore, url, payload, retries, backoff, stats)
+                succeeded = response.status_code == 200
+            except RuntimeError:
+                succeeded = False
+            stats["sent" if succeeded else "failed"] += count
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tick = 0
+        while duration is None or loop.time() - start < duration:
+            tick_start = loop.time()
+            jobs = []
+            for index, device_type in enumerate(DEVICE_TYPES):
+                count = devices // len(DEVICE_TYPES) + (index < devices % len(DEVICE_TYPES))
+                readings = generate_random_fault_data_bulk(device_type, count).to_dict(orient='records')
+                if batch_size > 0:
+                    jobs.extend(send(device_type, readings[offset:offset + batch_size],
+                                     len(readings[offset:offset + batch_size]))
+                                for offset in range(0, len(readings), batch_size))
+                else:
+                    jobs.extend(send(device_type, reading, 1) for reading in readings)
+            await asyncio.gather(*jobs)
+            elapsed = loop.time() - tick_start
+            print(f"Tick {tick}: {devices} readings in {elapsed:.2f}s ({devices / elapsed if elapsed else 0:,.0f}/s), "
+                  f"{stats['failed']} failed, {stats['retries']} retries so far")
+            tick += 1
+            await asyncio.sleep(max(0.0, interval - elapsed))
+    return stats
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send synthetic device readings to the prediction API")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="simulate a fleet with the asyncio sender instead of one reading per device")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between readings per device")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run (0 runs until stopped)")
+    parser.add_argument("--concurrency", type=int, default=100, help="maximum requests in flight")
+    parser.add_argument("--batch-size", type=int, default=0, help="readings per batch request (0 disables batching)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    args = parser.parse_args()
+    if args.devices < 1:
+        parser.error("--devices must be at least 1")
+
     try:
-        main()
+        if args.use_async:
+            stats = asyncio.run(simulate_fleet(
+                args.devices, args.interval, args.duration or None, args.concurrency,
+                args.batch_size, args.retries, base_url=args.base_url))
+            print(f"Sent {stats['sent']} readings, {stats['failed']} failed, {stats['retries']} retries")
+        else:
+            main()
     except KeyboardInterrupt:
-        print("\nStopping data sender...") 
\ No newline at end of file
+        print("\nStopping data sender...")
@@ -1,12 +1,50 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import pickle
-import pandas as pd
+import time
+IMPORT_START = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, Depends, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, JSONResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional
+from contextlib import asynccontextmanager, nullcontext, suppress
+import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
-import joblib  # Added for alternative model loading
+import asyncio
+import hmac
+import json
 import os
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from model_registry import ModelRegistry, MODEL_PATHS, DEVICE_TYPES, file_signature
+from model_registry import feature_names as model_feature_names
+from metrics import MetricsRegistry, process_memory
+from profiler import SamplingProfiler, ProfilerMiddleware
+
+# Optional binary wire formats
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    watcher = None
+    if MODEL_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(watch_model_files())
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    inference_pool.shutdown(wait=False, cancel_futures=True)
+    if profiler.samples:
+        print(f"Profile written to {profiler.dump()['folded']}")
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for frontend integration
 app.add_middleware(
@@ -17,49 +55,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize models as None
-ahu_model = None
-chiller_model = None
-generator_model = None
+# Devices scored with the compiled tree engine, e.g. FAST_INFERENCE=ahu,generator
+FAST_INFERENCE = {name.strip() for name in os.getenv("FAST_INFERENCE", "").split(",") if name.strip()}
+# Serve models from the shared memory-mapped store (implies the compiled engine)
+MODEL_STORE_MMAP = os.getenv("MODEL_STORE_MMAP", "0") == "1"
 
-def load_model(model_path):
-    """
-    Try different methods to load the model
-    """
-    try:
-        # Try loading with pickle first
-        with open(model_path, 'rb') as file:
-            return pickle.load(file)
-    except:
-        try:
-            # Try loading with joblib if pickle fails
-            return joblib.load(model_path)
-        except Exception as e:
-            print(f"Error loading model {model_path}: {str(e)}")
-            return None
+# Poll model files every N seconds and hot-reload on change (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+
+# Secret required by the /admin routes as "Authorization: Bearer <token>"; they are disabled while unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # Create models directory if it doesn't exist
 os.makedirs('models', exist_ok=True)
+MODELS_DIR = os.path.abspath('models')
 
-# Load the trained models with better error handling
-print("Loading models...")
-model_paths = {
-    'ahu': 'models/ahu_model.pkl',
-    'chiller': 'models/chiller_model.pkl',
-    'generator': 'models/generator_model.pkl'
-}
-
-for model_name, path in model_paths.items():
-    if os.path.exists(path):
-        if model_name == 'ahu':
-            ahu_model = load_model(path)
-        elif model_name == 'chiller':
-            chiller_model = load_model(path)
-        elif model_name == 'generator':
-            generator_model = load_model(path)
-        print(f"Loaded {model_name} model successfully")
-    else:
-        print(f"Warning: {model_name} model file not found at {path}")
+# Models are loaded lazily on first request and cached by the registry
+registry = ModelRegistry(MODEL_PATHS, compiled=FAST_INFERENCE, use_mmap=MODEL_STORE_MMAP,
+                         device_types=DEVICE_TYPES)
 
 # Pydantic models for data validation
 class AHUData(BaseModel):
@@ -98,68 +111,894 @@ class GeneratorData(BaseModel):
     run_hours: int
     fuel_level: float
 
-@app.post("/predict/ahu")
-async def predict_ahu(data: AHUData):
-    if ahu_model is None:
-        raise HTTPException(status_code=503, detail="AHU model not loaded")
-    try:
-        df = pd.DataFrame([data.dict()])
-        prediction = ahu_model.predict(df)[0]
-        probability = ahu_model.predict_proba(df)[0].max()
+# Request schema per device
+DEVICE_SCHEMAS = {
+    'ahu': AHUData,
+    'chiller': ChillerData,
+    'generator': GeneratorData
+}
+
+# Prometheus metrics exposed at /metrics
+metrics_registry = MetricsRegistry()
+HTTP_REQUESTS = metrics_registry.counter(
+    "genesis_http_requests_total", "HTTP requests by route, method and status code",
+    ("route", "method", "status"))
+HTTP_LATENCY = metrics_registry.histogram(
+    "genesis_http_request_duration_seconds", "HTTP request latency until the response starts",
+    ("route", "method"))
+STAGE_LATENCY = metrics_registry.histogram(
+    "genesis_prediction_stage_seconds",
+    "Prediction latency per stage (validation, feature_build, inference, serialization)",
+    ("device", "stage"))
+PREDICTIONS = metrics_registry.counter(
+    "genesis_predictions_total", "Records scored by the model", ("device",))
+BATCH_ROWS = metrics_registry.histogram(
+    "genesis_inference_batch_rows", "Rows per predict_proba call", ("device",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+INFERENCE_QUEUED = metrics_registry.gauge(
+    "genesis_inference_queued", "Inference jobs waiting for a worker", ("device",))
+INFERENCE_RUNNING = metrics_registry.gauge(
+    "genesis_inference_running", "Inference jobs currently running", ("device",))
+MICRO_BATCH_PENDING = metrics_registry.gauge(
+    "genesis_micro_batch_pending", "Single-record requests waiting for the next micro-batch", ("device",))
+CACHE_LOOKUPS = metrics_registry.counter(
+    "genesis_prediction_cache_lookups_total", "Prediction cache lookups by result", ("device", "result"))
+MODEL_LOADED = metrics_registry.gauge(
+    "genesis_model_loaded", "Whether the model is loaded (1) or not (0)", ("model",))
+MODEL_VERSION = metrics_registry.gauge(
+    "genesis_model_version", "Registry version of the model being served", ("model",))
+MODEL_LOAD_SECONDS = metrics_registry.gauge(
+    "genesis_model_load_seconds", "Time taken to load the model version being served", ("model",))
+PROCESS_RESIDENT_MEMORY = metrics_registry.gauge(
+    "genesis_process_resident_memory_bytes", "Resident set size of the server process")
+PROCESS_PEAK_MEMORY = metrics_registry.gauge(
+    "genesis_process_peak_resident_memory_bytes", "Peak resident set size of the server process")
+
+def observe_stage(device, stage):
+    """
+    Time one prediction stage; a no-op when no device is given (e.g. benchmarks)
+    """
+    if device is None:
+        return nullcontext()
+    return STAGE_LATENCY.time(device=device, stage=stage)
+
+class RequestMetricsMiddleware:
+    """
+    Count and time HTTP requests per matched route template.
+    Plain ASGI rather than @app.middleware so responses are passed through untouched.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                HTTP_LATENCY.observe(time.perf_counter() - start, route=route_path(scope), method=scope["method"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS.inc(route=route_path(scope), method=scope["method"], status=str(status))
+
+def route_path(scope):
+    # The router stores the matched route in the scope; unmatched paths share one label
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+app.add_middleware(RequestMetricsMiddleware)
+
+# Opt-in sampling profiler, e.g. PROFILE_SAMPLE_RATE=0.05 samples the whole process while 5% of requests are in flight
+profiler = SamplingProfiler(
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+    output_prefix=os.getenv("PROFILE_OUTPUT", "profiles/genesis")
+)
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+@lru_cache(maxsize=None)
+def schema_fields(record_type):
+    """
+    Field names of a pydantic schema in declaration order, looked up once per class
+    """
+    return tuple(record_type.model_fields)
+
+def feature_names(model, record_type):
+    """
+    Column order the model was trained with, falling back to the schema field order
+    """
+    return model_feature_names(model, schema_fields(record_type))
+
+def build_features(model, records):
+    """
+    Copy pydantic records straight into a float64 feature matrix in model column order
+    """
+    names = feature_names(model, type(records[0]))
+    features = np.empty((len(records), len(names)), dtype=np.float64)
+    for row, record in enumerate(records):
+        features[row] = [getattr(record, name) for name in names]
+    return features
+
+def predict_records(model, records, device=None):
+    """
+    Score a list of records with one vectorized predict_proba call
+    """
+    with observe_stage(device, "feature_build"):
+        features = build_features(model, records)
+    return predict_features(model, features, device)
+
+def predict_table(model, table, record_type, device=None):
+    """
+    Score an Arrow table by taking its columns straight into the feature matrix
+    """
+    with observe_stage(device, "feature_build"):
+        features = np.column_stack([
+            table.column(name).to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+            for name in feature_names(model, record_type)
+        ])
+    return predict_features(model, features, device)
+
+def predict_features(model, features, device=None):
+    """
+    Run predict_proba once; the class is derived from the probabilities
+    instead of a second predict pass
+    """
+    with observe_stage(device, "inference"):
+        probabilities = model.predict_proba(features)
+    if device is not None:
+        BATCH_ROWS.observe(len(features), device=device)
+        PREDICTIONS.inc(len(features), device=device)
+    best = probabilities.argmax(axis=1)
+    predictions = model.classes_[best]
+    return [
+        {"fault_type": int(prediction), "probability": float(probability)}
+        for prediction, probability in zip(predictions, probabilities[np.arange(len(best)), best])
+    ]
+
+# Inference runs on a bounded thread pool so the event loop stays responsive
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 4)))
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", str(INFERENCE_WORKERS)))
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+class InferenceLimiter:
+    """
+    Per-model concurrency limit for inference jobs, with queue-depth counters
+    """
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.queued = 0
+        self.max_queued = 0
+        self.running = 0
+        self.completed = 0
+
+    async def run(self, func, *args):
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(inference_pool, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.semaphore.release()
+
+    def stats(self):
         return {
-            "fault_type": int(prediction),
-            "probability": float(probability),
-            "data": data.dict()
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "completed": self.completed
         }
+
+limiters = {
+    'ahu': InferenceLimiter(INFERENCE_MAX_CONCURRENCY),
+    'chiller': InferenceLimiter(INFERENCE_MAX_CONCURRENCY),
+    'generator': InferenceLimiter(INFERENCE_MAX_CONCURRENCY)
+}
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-record predictions into one predict_proba call.
+    A batch is flushed when max_batch_size requests are waiting or when
+    max_delay seconds have passed since the first request was queued.
+    """
+    def __init__(self, name, get_model, limiter, max_batch_size=64, max_delay=0.002):
+        self.name = name
+        self.get_model = get_model
+        self.limiter = limiter
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.pending = []
+        self.flush_handle = None
+        self.tasks = set()
+
+    async def submit(self, record):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((record, future))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self.run_batch(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, batch):
+        try:
+            results = await self.limiter.run(
+                predict_records, self.get_model(), [record for record, _ in batch], self.name
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+async def get_model(name):
+    """
+    Fetch a model from the registry, loading it off the event loop on first use
+    """
+    model = registry.models.get(name)
+    if model is not None:
+        return model
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_pool, registry.get, name)
+
+# Micro-batching configuration (set MICROBATCH_MAX_SIZE=1 to disable coalescing)
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_DELAY = float(os.getenv("MICROBATCH_MAX_DELAY_MS", "2")) / 1000
+
+batchers = {
+    'ahu': MicroBatcher('ahu', lambda: registry.get('ahu'), limiters['ahu'], MICROBATCH_MAX_SIZE, MICROBATCH_MAX_DELAY),
+    'chiller': MicroBatcher('chiller', lambda: registry.get('chiller'), limiters['chiller'], MICROBATCH_MAX_SIZE, MICROBATCH_MAX_DELAY),
+    'generator': MicroBatcher('generator', lambda: registry.get('generator'), limiters['generator'], MICROBATCH_MAX_SIZE, MICROBATCH_MAX_DELAY)
+}
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction results with a time-to-live.
+    Records are keyed on their feature values rounded to per-parameter
+    tolerances, so steady-state readings that differ only by sensor noise
+    share one entry. Entries are dropped whenever the served model changes.
+    """
+    def __init__(self, tolerances, max_size=0, ttl=30.0):
+        self.tolerances = tolerances
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # (field, tolerance) pairs per schema class, built on first use
+        self.key_fields = {}
+        self.model = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def key(self, record):
+        fields = self.key_fields.get(type(record))
+        if fields is None:
+            fields = tuple((name, self.tolerances.get(name, 0)) for name in schema_fields(type(record)))
+            self.key_fields[type(record)] = fields
+        values = []
+        for name, tolerance in fields:
+            value = getattr(record, name)
+            values.append(round(value / tolerance) if tolerance else value)
+        return tuple(values)
+
+    def get(self, model, key):
+        if model is not self.model:
+            self.entries.clear()
+            self.model = model
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] < time.monotonic():
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, model, key, result):
+        if model is not self.model:
+            return
+        self.entries[key] = (result, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+# Prediction cache configuration (PREDICTION_CACHE_SIZE=0 disables caching)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "0"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "30"))
+
+# Readings closer than these steps are treated as identical by the cache
+CACHE_TOLERANCES = {
+    'ahu': {
+        'supply_air_temp': 0.1, 'return_air_temp': 0.1, 'room_air_temp': 0.1,
+        'return_air_humidity': 0.5, 'fan_speed': 1.0, 'filter_dp': 2.0,
+        'cool_water_valve': 0.5, 'hot_water_valve': 0.5, 'outside_air_damper': 0.5
+    },
+    'chiller': {
+        'chill_water_outlet': 0.05, 'chill_water_inlet': 0.05, 'condenser_pressure': 0.02,
+        'differential_pressure': 0.1, 'supply_water_temp': 0.1
+    },
+    'generator': {
+        'oil_pressure': 0.02, 'coolant_temp': 0.2, 'battery_voltage': 0.05,
+        'phase1_voltage': 0.5, 'phase2_voltage': 0.5, 'phase3_voltage': 0.5,
+        'frequency': 0.02, 'load_percent': 0.5, 'run_hours': 10, 'fuel_level': 0.5
+    }
+}
+
+caches = {
+    name: PredictionCache(tolerances, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+    for name, tolerances in CACHE_TOLERANCES.items()
+}
+
+async def predict_one(name, model, record):
+    """
+    Score one record through the prediction cache and the micro-batcher
+    """
+    cache = caches[name]
+    key = cache.key(record) if cache.enabled else None
+    if key is not None:
+        result = cache.get(model, key)
+        if result is not None:
+            return result
+    result = await batchers[name].submit(record)
+    if key is not None:
+        cache.put(model, key, result)
+    return result
+
+async def predict_many(name, model, records):
+    """
+    Score a list of records, running one inference job for the cache misses
+    """
+    cache = caches[name]
+    results = [None] * len(records)
+    keys = [cache.key(record) for record in records] if cache.enabled else None
+    misses = []
+    for index in range(len(records)):
+        if keys is not None:
+            results[index] = cache.get(model, keys[index])
+        if results[index] is None:
+            misses.append(index)
+    if misses:
+        scored = await limiters[name].run(predict_records, model, [records[index] for index in misses], name)
+        for index, result in zip(misses, scored):
+            results[index] = result
+            if keys is not None:
+                cache.put(model, keys[index], result)
+    return results
+
+# Content types accepted and produced by the prediction endpoints
+JSON_TYPE = "application/json"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+def content_type(request):
+    return request.headers.get("content-type", JSON_TYPE).split(";")[0].strip().lower()
+
+def accepts(request, media_types):
+    """
+    Whether the Accept header lists one of media_types exactly, with a non-zero q
+    """
+    for entry in request.headers.get("accept", "").lower().split(","):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        if media_type not in media_types:
+            continue
+        quality = next((param[2:] for param in params if param.startswith("q=")), "1")
+        try:
+            if float(quality) > 0:
+                return True
+        except ValueError:
+            continue
+    return False
+
+def decode_body(request, body):
+    """
+    Decode a JSON or MessagePack request body into Python objects
+    """
+    media_type = content_type(request)
+    try:
+        if media_type in MSGPACK_TYPES:
+            if msgpack is None:
+                raise HTTPException(status_code=415, detail="MessagePack support requires the msgpack package")
+            return msgpack.unpackb(body)
+        return json.loads(body)
+    except ValueError as e:
+        # Same 422 FastAPI returns for an undecodable JSON body
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": f"Malformed {media_type} body",
+                                       "input": {}, "ctx": {"error": str(e)}}])
+
+def validate(record_type, payload, location=()):
+    if not isinstance(payload, dict):
+        raise RequestValidationError([{"type": "dict_type", "loc": ("body",) + location,
+                                       "msg": "Input should be a valid dictionary", "input": payload}])
+    try:
+        return record_type.model_validate(payload)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body",) + location + tuple(error["loc"]), "input": error_input(error["input"])}
+            for error in e.errors()
+        ])
+
+def error_input(value):
+    # MessagePack can carry bytes keys/values the JSON error response can't encode
+    try:
+        jsonable_encoder(value)
+        return value
+    except (TypeError, ValueError):
+        return repr(value)
+
+def single_record(name):
+    """
+    Dependency parsing one record from a JSON or MessagePack body
+    """
+    record_type = DEVICE_SCHEMAS[name]
+    async def parse(request: Request):
+        body = await request.body()
+        with observe_stage(name, "validation"):
+            return validate(record_type, decode_body(request, body))
+    return parse
+
+def validate_table(record_type, table):
+    """
+    Check an Arrow batch the way the schema checks JSON records: every field present
+    as a numeric column without nulls, and integer fields without fractions.
+    Errors are located by column rather than by record.
+    """
+    errors = []
+    for field, info in record_type.model_fields.items():
+        loc = ("body", field)
+        if field not in table.column_names:
+            errors.append({"type": "missing", "loc": loc, "msg": "Field required", "input": None})
+            continue
+        column = table.column(field)
+        if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+                or pa.types.is_boolean(column.type)):
+            errors.append({"type": "float_type", "loc": loc, "input": None,
+                           "msg": f"Column should be numeric, got {column.type}"})
+        elif column.null_count:
+            errors.append({"type": "missing", "loc": loc, "input": None,
+                           "msg": f"Column has {column.null_count} null values"})
+        elif info.annotation is int and pa.types.is_floating(column.type):
+            values = column.to_numpy(zero_copy_only=False)
+            if not np.array_equal(values, np.floor(values)):
+                errors.append({"type": "int_from_float", "loc": loc, "input": None,
+                               "msg": "Input should be a valid integer, got a number with a fractional part"})
+    if errors:
+        raise RequestValidationError(errors)
+
+def decode_batch(request, body, record_type):
+    """
+    Parse a batch from a JSON/MessagePack list or an Arrow IPC stream.
+    Arrow tables are returned as-is so their columns skip per-record validation.
+    """
+    if content_type(request) == ARROW_STREAM_TYPE:
+        if pa is None:
+            raise HTTPException(status_code=415, detail="Arrow support requires the pyarrow package")
+        try:
+            table = pa.ipc.open_stream(body).read_all()
+        except pa.ArrowInvalid as e:
+            raise HTTPException(status_code=400, detail=f"Malformed Arrow stream: {str(e)}")
+        validate_table(record_type, table)
+        return table
+    payload = decode_body(request, body)
+    if not isinstance(payload, list):
+        raise RequestValidationError([{"type": "list_type", "loc": ("body",),
+                                       "msg": "Input should be a valid list", "input": payload}])
+    return [validate(record_type, item, (index,)) for index, item in enumerate(payload)]
+
+def batch_records(name):
+    """
+    Dependency parsing a batch of records for a device
+    """
+    record_type = DEVICE_SCHEMAS[name]
+    async def parse(request: Request):
+        body = await request.body()
+        with observe_stage(name, "validation"):
+            return decode_batch(request, body, record_type)
+    return parse
+
+def request_body(record_type, many=False):
+    """
+    OpenAPI request body for routes that parse their own body
+    """
+    schema = record_type.model_json_schema()
+    if many:
+        schema = {"type": "array", "items": schema}
+    content = {JSON_TYPE: {"schema": schema}, MSGPACK_TYPES[0]: {"schema": schema}}
+    if many:
+        content[ARROW_STREAM_TYPE] = {}
+    return {"requestBody": {"required": True, "content": content}}
+
+def negotiate(request, payload, device=None):
+    """
+    Encode a response as MessagePack when the client asks for it, JSON otherwise
+    """
+    if accepts(request, MSGPACK_TYPES):
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="MessagePack support requires the msgpack package")
+        with observe_stage(device, "serialization"):
+            return Response(msgpack.packb(payload), media_type=MSGPACK_TYPES[0])
+    with observe_stage(device, "serialization"):
+        return JSONResponse(payload)
+
+def encode_arrow(results):
+    table = pa.table({
+        "fault_type": pa.array([result["fault_type"] for result in results], type=pa.int64()),
+        "probability": pa.array([result["probability"] for result in results], type=pa.float64())
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_TYPE)
+
+def negotiate_batch(request, results, device=None):
+    """
+    Encode batch results as an Arrow IPC stream, MessagePack or JSON
+    """
+    if accepts(request, (ARROW_STREAM_TYPE,)):
+        if pa is None:
+            raise HTTPException(status_code=406, detail="Arrow support requires the pyarrow package")
+        with observe_stage(device, "serialization"):
+            return encode_arrow(results)
+    return negotiate(request, {"count": len(results), "results": results}, device)
+
+async def serve_single(name, label, request, data, include_data):
+    model = await get_model(name)
+    if model is None:
+        raise HTTPException(status_code=503, detail=f"{label} model not loaded")
+    try:
+        result = await predict_one(name, model, data)
+        response = {
+            "fault_type": result["fault_type"],
+            "probability": result["probability"]
+        }
+        if include_data:
+            response["data"] = data.model_dump()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return negotiate(request, response, name)
 
-@app.post("/predict/chiller")
-async def predict_chiller(data: ChillerData):
-    if chiller_model is None:
-        raise HTTPException(status_code=503, detail="Chiller model not loaded")
+async def serve_batch(name, label, request, data):
+    model = await get_model(name)
+    if model is None:
+        raise HTTPException(status_code=503, detail=f"{label} model not loaded")
+    if len(data) == 0:
+        return negotiate_batch(request, [], name)
     try:
-        df = pd.DataFrame([data.dict()])
-        prediction = chiller_model.predict(df)[0]
-        probability = chiller_model.predict_proba(df)[0].max()
-        return {
-            "fault_type": int(prediction),
-            "probability": float(probability),
-            "data": data.dict()
-        }
+        if isinstance(data, list):
+            results = await predict_many(name, model, data)
+        else:
+            results = await limiters[name].run(predict_table, model, data, DEVICE_SCHEMAS[name], name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return negotiate_batch(request, results, name)
+
+# Prediction routes accept JSON or MessagePack bodies (batch routes also take Arrow
+# IPC streams) and answer in the format named by the Accept header.
+# include_data=false drops the echoed input from single-record responses.
+@app.post("/predict/ahu", openapi_extra=request_body(AHUData))
+async def predict_ahu(request: Request, data: AHUData = Depends(single_record('ahu')),
+                      include_data: bool = True):
+    return await serve_single('ahu', "AHU", request, data, include_data)
+
+@app.post("/predict/chiller", openapi_extra=request_body(ChillerData))
+async def predict_chiller(request: Request, data: ChillerData = Depends(single_record('chiller')),
+                          include_data: bool = True):
+    return await serve_single('chiller', "Chiller", request, data, include_data)
+
+@app.post("/predict/generator", openapi_extra=request_body(GeneratorData))
+async def predict_generator(request: Request, data: GeneratorData = Depends(single_record('generator')),
+                            include_data: bool = True):
+    return await serve_single('generator', "Generator", request, data, include_data)
+
+@app.post("/predict/ahu/batch", openapi_extra=request_body(AHUData, many=True))
+async def predict_ahu_batch(request: Request, data=Depends(batch_records('ahu'))):
+    return await serve_batch('ahu', "AHU", request, data)
+
+@app.post("/predict/chiller/batch", openapi_extra=request_body(ChillerData, many=True))
+async def predict_chiller_batch(request: Request, data=Depends(batch_records('chiller'))):
+    return await serve_batch('chiller', "Chiller", request, data)
+
+@app.post("/predict/generator/batch", openapi_extra=request_body(GeneratorData, many=True))
+async def predict_generator_batch(request: Request, data=Depends(batch_records('generator'))):
+    return await serve_batch('generator', "Generator", request, data)
+
+# Streaming ingestion: readings scored per flush, and readings buffered per connection
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "256"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "1024"))
+
+async def score_readings(readings):
+    """
+    Score streamed readings ({"device_type", "unit_id", "data"}) in input order,
+    running one inference job per device type present in the batch
+    """
+    results = [None] * len(readings)
+    groups = {}
+    for index, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            results[index] = {"unit_id": None, "error": "Reading must be a JSON object"}
+            continue
+        results[index] = {"unit_id": reading.get("unit_id"), "device_type": reading.get("device_type")}
+        name = str(reading.get("device_type", "")).lower()
+        if name not in DEVICE_SCHEMAS:
+            results[index]["error"] = f"Unknown device type: {reading.get('device_type')}"
+            continue
+        try:
+            with observe_stage(name, "validation"):
+                record = DEVICE_SCHEMAS[name](**(reading.get("data") or {}))
+        except (TypeError, ValidationError) as e:
+            results[index]["error"] = str(e)
+            continue
+        groups.setdefault(name, []).append((index, record))
 
-@app.post("/predict/generator")
-async def predict_generator(data: GeneratorData):
-    if generator_model is None:
-        raise HTTPException(status_code=503, detail="Generator model not loaded")
+    async def score_group(name, items):
+        model = await get_model(name)
+        if model is None:
+            for index, _ in items:
+                results[index]["error"] = f"{name} model not loaded"
+            return
+        try:
+            scored = await predict_many(name, model, [record for _, record in items])
+        except Exception as e:
+            for index, _ in items:
+                results[index]["error"] = str(e)
+            return
+        for (index, _), result in zip(items, scored):
+            results[index].update(result)
+
+    await asyncio.gather(*(score_group(name, items) for name, items in groups.items()))
+    return results
+
+def parse_reading(line):
     try:
-        df = pd.DataFrame([data.dict()])
-        prediction = generator_model.predict(df)[0]
-        probability = generator_model.predict_proba(df)[0].max()
-        return {
-            "fault_type": int(prediction),
-            "probability": float(probability),
-            "data": data.dict()
-        }
+        return json.loads(line)
+    except ValueError:
+        return None
+
+@app.websocket("/ws/predict")
+async def predict_websocket(websocket: WebSocket):
+    """
+    Persistent telemetry stream. Each text frame holds one reading or a list of
+    readings; each reply frame is the list of results for one server-side batch.
+    Frames that aren't JSON text get an error result. A bounded queue stops
+    reading from the socket when scoring falls behind.
+    """
+    await websocket.accept()
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    closed = object()
+
+    async def receive():
+        try:
+            while True:
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                # Binary frames get the same error reply as malformed JSON
+                message = parse_reading(frame["text"]) if frame.get("text") is not None else None
+                for reading in (message if isinstance(message, list) else [message]):
+                    await queue.put(reading)
+        except Exception as e:
+            print(f"Stream receive error: {str(e)}")
+        # Not in a finally: when the sender stops first this task is cancelled,
+        # and waiting on a full queue again would leak it with its readings
+        await queue.put(closed)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        finished = False
+        while not finished:
+            batch = [await queue.get()]
+            while len(batch) < STREAM_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            if closed in batch:
+                batch = batch[:batch.index(closed)]
+                finished = True
+            if batch:
+                await websocket.send_text(json.dumps(await score_readings(batch)))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        with suppress(asyncio.CancelledError):
+            await receiver
+
+async def watch_model_files():
+    """
+    Reload a model whenever its file changes on disk.
+    Replace model files atomically (write elsewhere, then move) so a
+    half-written file is never picked up.
+    """
+    loop = asyncio.get_running_loop()
+    # Files present at startup are loaded lazily as usual; a file that appears
+    # later (e.g. a first chiller model) counts as a change and goes live
+    seen = {name: file_signature(path) for name, path in registry.paths.items()}
+    while True:
+        for name, path in registry.paths.items():
+            signature = file_signature(path)
+            if signature == seen[name]:
+                continue
+            seen[name] = signature
+            if signature is None:
+                continue  # removed: keep serving the loaded version
+            try:
+                info = await loop.run_in_executor(None, registry.reload, name)
+                print(f"Hot-reloaded {name} model as version {info['version']}")
+            except Exception as e:
+                print(f"Hot reload of {name} model failed: {str(e)}")
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+
+def require_admin(request: Request):
+    """
+    Reject admin calls that don't carry ADMIN_TOKEN (all of them while it is unset)
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+async def list_models():
+    """
+    Current version of each model plus every version loaded in this process
+    """
+    return {
+        "models": registry.status(),
+        "history": registry.history
+    }
+
+@app.post("/admin/models/{name}/reload", dependencies=[Depends(require_admin)])
+async def reload_model(name: str, path: Optional[str] = None):
+    """
+    Load, warm and atomically swap in a model file (defaults to the configured path)
+    """
+    if name not in registry.paths:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    if path is not None and not os.path.abspath(path).startswith(MODELS_DIR + os.sep):
+        raise HTTPException(status_code=400, detail="Model path must be inside the models directory")
+    loop = asyncio.get_running_loop()
+    try:
+        info = await loop.run_in_executor(None, registry.reload, name, path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "reloaded", "model": name, "version": info}
+
+@app.post("/admin/models/{name}/rollback", dependencies=[Depends(require_admin)])
+async def rollback_model(name: str):
+    """
+    Instantly swap the previously served version back in
+    """
+    if name not in registry.paths:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    try:
+        info = registry.rollback(name)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "rolled back", "model": name, "version": info}
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_status():
+    """
+    Sampling profiler settings and how much has been collected so far
+    """
+    return profiler.stats()
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def configure_profile(sample_rate: float):
+    """
+    Start sampling a fraction of requests (0 < sample_rate <= 1) or stop (0)
+    """
+    try:
+        profiler.set_sample_rate(sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.stats()
+
+@app.post("/admin/profile/dump", dependencies=[Depends(require_admin)])
+async def dump_profile(reset: bool = False):
+    """
+    Write collapsed stacks and per-function timings to the profile output files
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, profiler.dump, reset)
 
 @app.get("/health")
 async def health_check():
     """
-    Endpoint to check if models are loaded properly
+    Endpoint to check which models are loaded and how long they took to load
     """
+    models = registry.status()
     return {
         "status": "running",
-        "models_loaded": {
-            "ahu": ahu_model is not None,
-            "chiller": chiller_model is not None,
-            "generator": generator_model is not None
-        }
+        "models_loaded": {name: info["loaded"] for name, info in models.items()},
+        "cold_start": {
+            "server_import_seconds": IMPORT_SECONDS,
+            "models": models
+        },
+        "inference": {
+            "workers": INFERENCE_WORKERS,
+            "models": {name: limiter.stats() for name, limiter in limiters.items()},
+            "pending_micro_batch": {name: len(batcher.pending) for name, batcher in batchers.items()}
+        },
+        "prediction_cache": {name: cache.stats() for name, cache in caches.items()}
     }
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text exposition of request, stage, queue, cache, model and memory metrics
+    """
+    for name, limiter in limiters.items():
+        INFERENCE_QUEUED.set(limiter.queued, device=name)
+        INFERENCE_RUNNING.set(limiter.running, device=name)
+    for name, batcher in batchers.items():
+        MICRO_BATCH_PENDING.set(len(batcher.pending), device=name)
+    for name, cache in caches.items():
+        CACHE_LOOKUPS.set_total(cache.hits, device=name, result="hit")
+        CACHE_LOOKUPS.set_total(cache.misses, device=name, result="miss")
+    for name, info in registry.status().items():
+        MODEL_LOADED.set(int(info["loaded"]), model=name)
+        if info["version"] is not None:
+            MODEL_VERSION.set(info["version"], model=name)
+            MODEL_LOAD_SECONDS.set(info["load_seconds"], model=name)
+    resident, peak = process_memory()
+    if resident is not None:
+        PROCESS_RESIDENT_MEMORY.set(resident)
+        PROCESS_PEAK_MEMORY.set(peak)
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_START
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
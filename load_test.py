@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import json
+import math
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import httpx
+import numpy as np
+from data_sender import generate_random_fault_data_bulk, DEVICE_TYPES
+
+# Share of the simulated units active at a given fraction of the test duration
+PROFILES = {
+    'constant': lambda progress: 1.0,
+    'ramp': lambda progress: progress,
+    'ramp-hold': lambda progress: min(1.0, progress / 0.3),
+    'step': lambda progress: min(4, math.floor(progress * 4) + 1) / 4,
+    'spike': lambda progress: 1.0 if 0.4 <= progress < 0.6 else 0.2
+}
+
+PERCENTILES = [50, 90, 95, 99]
+SCHEDULER_TICK = 0.01
+
+@contextmanager
+def local_server(port, startup_timeout=120.0):
+    """
+    Run fastapi_server under uvicorn for the duration of the test
+    """
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "fastapi_server:app",
+                                "--port", str(port), "--log-level", "warning"])
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                httpx.get(f"{base_url}/health", timeout=1.0).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not become healthy")
+                time.sleep(0.25)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+async def run_load(base_url, device_types, units, rate, duration, profile, concurrency, pool_size, warmup=True):
+    """
+    Open-loop load: each active unit sends `rate` readings per second, the number of
+    active units following the profile. Latency is measured from the scheduled send
+    time, so client-side queueing behind the concurrency limit is included.
+    With warmup, one unmeasured request per device type loads the models first.
+    Returns (rows, target request count, elapsed seconds); rows are
+    (device_type, offset, latency, status).
+    """
+    pools = {device_type: generate_random_fault_data_bulk(device_type, pool_size).to_dict(orient='records')
+             for device_type in device_types}
+    rows = []
+    tasks = set()
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    loop = asyncio.get_running_loop()
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def fire(device_type, payload, scheduled):
+            async with semaphore:
+                try:
+                    response = await client.post(f"/predict/{device_type.lower()}?include_data=false",
+                                                 json=payload)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+            rows.append((device_type, scheduled - start, loop.time() - scheduled, status))
+
+        if warmup:
+            for device_type in device_types:
+                await client.post(f"/predict/{device_type.lower()}?include_data=false",
+                                  json=pools[device_type][0])
+
+        start = previous = loop.time()
+        due = dict.fromkeys(device_types, 0.0)
+        target = 0.0
+        sent = 0
+        while (now := loop.time()) - start < duration:
+            active = units * PROFILES[profile]((now - start) / duration)
+            for device_type in device_types:
+                due[device_type] += active * rate * (now - previous)
+                target += active * rate * (now - previous)
+                while due[device_type] >= 1:
+                    due[device_type] -= 1
+                    payload = pools[device_type][sent % pool_size]
+                    sent += 1
+                    task = asyncio.create_task(fire(device_type, payload, now))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            previous = now
+            await asyncio.sleep(SCHEDULER_TICK)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = loop.time() - start
+    return rows, round(target), elapsed
+
+def summarize(rows, elapsed):
+    """
+    Achieved RPS, error rate, status counts and latency percentiles for a set of results
+    """
+    statuses = {}
+    for _, _, _, status in rows:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if status != '200')
+    latencies = np.array([latency for _, _, latency, _ in rows]) * 1000
+    summary = {
+        "requests": len(rows),
+        "achieved_rps": len(rows) / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "error_rate": errors / len(rows) if rows else 0.0,
+        "status_counts": statuses,
+        "latency_ms": {}
+    }
+    if len(latencies):
+        summary["latency_ms"] = {
+            **{f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))},
+            "mean": float(latencies.mean()),
+            "max": float(latencies.max())
+        }
+    return summary
+
+def timeline(rows, duration):
+    """
+    Per-second request count, error count and p99 latency, by scheduled send time
+    """
+    seconds = []
+    for second in range(math.ceil(duration)):
+        window = [row for row in rows if second <= row[1] < second + 1]
+        latencies = [latency * 1000 for _, _, latency, _ in window]
+        seconds.append({
+            "second": second,
+            "requests": len(window),
+            "errors": sum(1 for row in window if row[3] != 200),
+            "p99_ms": float(np.percentile(latencies, 99)) if latencies else None
+        })
+    return seconds
+
+def build_report(config, rows, target, elapsed):
+    return {
+        "generated_at": datetime.now().isoformat(timespec='seconds'),
+        "config": config,
+        "target_requests": target,
+        "elapsed_seconds": elapsed,
+        "overall": summarize(rows, elapsed),
+        "devices": {
+            device_type: summarize([row for row in rows if row[0] == device_type], elapsed)
+            for device_type in config["device_types"]
+        },
+        "timeline": timeline(rows, config["duration"])
+    }
+
+def compare(report, baseline, max_regression):
+    """
+    Print current vs baseline results; True when p99, throughput or error rate regressed
+    """
+    regressed = False
+    scopes = [("overall", report["overall"], baseline.get("overall"))]
+    scopes += [(name, summary, baseline.get("devices", {}).get(name))
+               for name, summary in report["devices"].items()]
+    for name, current, previous in scopes:
+        if not previous or not previous.get("latency_ms") or not current.get("latency_ms"):
+            continue
+        p99_change = current["latency_ms"]["p99"] / previous["latency_ms"]["p99"] - 1
+        rps_change = current["achieved_rps"] / previous["achieved_rps"] - 1 if previous["achieved_rps"] else 0.0
+        error_change = current["error_rate"] - previous["error_rate"]
+        print(f"{name:>10}: p99 {previous['latency_ms']['p99']:.1f} -> {current['latency_ms']['p99']:.1f}ms "
+              f"({p99_change:+.0%}), rps {previous['achieved_rps']:.0f} -> {current['achieved_rps']:.0f} "
+              f"({rps_change:+.0%}), errors {previous['error_rate']:.2%} -> {current['error_rate']:.2%}")
+        if p99_change > max_regression or rps_change < -max_regression or error_change > 0.01:
+            regressed = True
+    return regressed
+
+def print_summary(report):
+    for name, summary in [("overall", report["overall"]), *report["devices"].items()]:
+        latency = summary["latency_ms"]
+        percentiles = "  ".join(f"{key} {latency[key]:.1f}ms" for key in [f"p{p}" for p in PERCENTILES]) \
+            if latency else "no responses"
+        print(f"{name:>10}: {summary['requests']:>7} requests, {summary['achieved_rps']:,.0f} rps, "
+              f"{summary['error_rate']:.2%} errors, {percentiles}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the prediction API with simulated device fleets")
+    parser.add_argument("--base-url", help="server to test (default: start a local uvicorn instance)")
+    parser.add_argument("--port", type=int, default=8765, help="port for the local uvicorn instance")
+    parser.add_argument("--device", choices=DEVICE_TYPES, action="append",
+                        help="device type to simulate (repeatable, default: all)")
+    parser.add_argument("--units", type=int, default=100, help="simulated units per device type")
+    parser.add_argument("--rate", type=float, default=1.0, help="readings per second per unit")
+    parser.add_argument("--duration", type=float, default=30.0, help="test length in seconds")
+    parser.add_argument("--profile", choices=list(PROFILES), default="constant",
+                        help="how the number of active units changes over the test")
+    parser.add_argument("--concurrency", type=int, default=200, help="maximum requests in flight")
+    parser.add_argument("--pool-size", type=int, default=1000, help="pre-generated readings per device type")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false",
+                        help="include model cold start in the measurements")
+    parser.add_argument("--report", default="load_report.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed relative p99/throughput regression before exiting with status 1")
+    args = parser.parse_args()
+
+    config = {
+        "device_types": args.device or DEVICE_TYPES,
+        "units": args.units,
+        "rate": args.rate,
+        "duration": args.duration,
+        "profile": args.profile,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup
+    }
+
+    def run(base_url):
+        config["base_url"] = base_url
+        return asyncio.run(run_load(base_url, config["device_types"], args.units, args.rate, args.duration,
+                                    args.profile, args.concurrency, args.pool_size, args.warmup))
+
+    if args.base_url:
+        rows, target, elapsed = run(args.base_url)
+    else:
+        with local_server(args.port) as base_url:
+            rows, target, elapsed = run(base_url)
+
+    report = build_report(config, rows, target, elapsed)
+    with open(args.report, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Target {target} requests, sent {len(rows)} in {elapsed:.1f}s")
+    print_summary(report)
+    print(f"Report written to {args.report}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            if compare(report, json.load(file), args.max_regression):
+                print("Regression against baseline")
+                sys.exit(1)
@@ -0,0 +1,291 @@
+import glob
+import hashlib
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+import joblib
+from tree_engine import CompiledTreeEnsemble
+
+# Trained model files shared by the API server and the desktop UI
+MODEL_PATHS = {
+    'ahu': 'models/ahu_model.pkl',
+    'chiller': 'models/chiller_model.pkl',
+    'generator': 'models/generator_model.pkl'
+}
+
+# Synthetic data generator device type used to warm each model before a swap
+DEVICE_TYPES = {
+    'ahu': 'AHU',
+    'chiller': 'Chiller',
+    'generator': 'Generator'
+}
+
+def load_model(model_path):
+    """
+    Try different methods to load the model
+    """
+    try:
+        # Try loading with pickle first
+        with open(model_path, 'rb') as file:
+            return pickle.load(file)
+    except Exception:
+        try:
+            # Try loading with joblib if pickle fails
+            return joblib.load(model_path)
+        except Exception as e:
+            print(f"Error loading model {model_path}: {str(e)}")
+            return None
+
+def store_path(model_path, checksum):
+    """
+    Location of the memory-mappable compiled form of one version of a model file.
+    The name carries the pickle's checksum, so a store never outlives the version
+    it was compiled from (mv keeps old mtimes, so timestamps can't tell).
+    """
+    return f"{os.path.splitext(model_path)[0]}.{checksum}.mmap"
+
+def existing_stores(model_path):
+    """
+    Compiled stores written for any version of a model file, newest first
+    """
+    stores = glob.glob(f"{glob.escape(os.path.splitext(model_path)[0])}.*.mmap")
+    return sorted(stores, key=os.path.getmtime, reverse=True)
+
+def file_checksum(path):
+    """
+    Short content hash identifying a model file version
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+def file_signature(path):
+    """
+    Cheap (mtime, size) fingerprint of a model file, None if it doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def feature_names(model, default=None):
+    """
+    Column order the model was trained with (LightGBM/compiled feature_name_, then
+    scikit-learn feature_names_in_), falling back to `default`
+    """
+    names = getattr(model, 'feature_name_', None)
+    if names is None:
+        names = getattr(model, 'feature_names_in_', None)
+    if names is None:
+        names = default
+    if names is None:
+        raise ValueError(f"{type(model).__name__} does not record its feature names")
+    return list(names)
+
+def warm_model(model, device_type, rows=32):
+    """
+    Run a few synthetic predictions so a freshly loaded model is ready to serve
+    """
+    from data_genarator import generate_device_data
+    df = generate_device_data(device_type, num_samples=rows, fault_samples=rows // 8)
+    probabilities = model.predict_proba(df[feature_names(model)].to_numpy(dtype='float64'))
+    if probabilities.shape != (rows, len(model.classes_)):
+        raise ValueError(f"Unexpected warm-up output shape {probabilities.shape}")
+
+def export_store(model, path):
+    """
+    Write a compiled model as an uncompressed joblib file whose arrays can be memory-mapped
+    """
+    if not isinstance(model, CompiledTreeEnsemble):
+        model = CompiledTreeEnsemble.from_lgbm(model)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, temp_path)
+    os.replace(temp_path, path)
+    return model
+
+def remove_stale_stores(model_path, current):
+    # Processes still mapping an old store keep their pages until they reload
+    for stale in existing_stores(model_path):
+        if stale != current:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+class ModelRegistry:
+    """
+    Versioned model registry that loads models lazily and swaps them atomically.
+
+    With use_mmap enabled, models are served from the compiled store next to
+    each pickle (models/<name>_model.<checksum>.mmap). Its arrays are
+    memory-mapped read-only, so every worker process on the host shares the
+    same pages. The store is written on first load when none exists for the
+    pickle's current checksum.
+
+    reload() loads and warms a new version before replacing the current one,
+    so requests already holding the old model finish on it; rollback()
+    swaps the previous version straight back in.
+    """
+    def __init__(self, paths=None, compiled=(), use_mmap=False, device_types=None):
+        self.paths = dict(paths or MODEL_PATHS)
+        self.compiled = set(compiled)
+        self.use_mmap = use_mmap
+        self.device_types = dict(device_types or {})
+        self.models = {}
+        self.versions = {}
+        self.previous = {}
+        self.history = {}
+        self.next_version = 1
+        # File signature at the last failed load; retried once the file changes
+        self.failed = {}
+        self.lock = threading.Lock()
+        self.reload_locks = {name: threading.Lock() for name in self.paths}
+
+    def get(self, name):
+        """
+        Return the current model, loading it on first use (None if unavailable)
+        """
+        model = self.models.get(name)
+        if model is not None or self.unchanged_since_failure(name):
+            return model
+        # Loading can take seconds; only this model's first users wait on it,
+        # self.lock is held just for the swap so rollbacks never queue behind a load
+        with self.reload_locks[name]:
+            if self.models.get(name) is None and not self.unchanged_since_failure(name):
+                signature = file_signature(self.paths[name])
+                model, info = self._load(name, self.paths[name])
+                if model is None:
+                    self.failed[name] = signature
+                else:
+                    with self.lock:
+                        self._install(name, model, info)
+        return self.models.get(name)
+
+    def unchanged_since_failure(self, name):
+        return name in self.failed and self.failed[name] == file_signature(self.paths[name])
+
+    def is_loaded(self, name):
+        return self.models.get(name) is not None
+
+    def reload(self, name, path=None, warm=True):
+        """
+        Load a model file as a new version, warm it, then swap it in.
+        Blocks the calling thread; the current version keeps serving meanwhile.
+        """
+        path = path or self.paths[name]
+        with self.reload_locks[name]:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Model file not found at {path}")
+            model, info = self._load(name, path)
+            if model is None:
+                raise RuntimeError(f"Failed to load {name} model from {path}")
+            if warm and name in self.device_types:
+                start = time.perf_counter()
+                warm_model(model, self.device_types[name])
+                info["warm_seconds"] = time.perf_counter() - start
+            with self.lock:
+                self._install(name, model, info)
+            return info
+
+    def rollback(self, name):
+        """
+        Swap the previous version back in; the replaced version becomes the new previous
+        """
+        with self.lock:
+            if name not in self.previous:
+                raise LookupError(f"No previous {name} model version to roll back to")
+            model, info = self.previous.pop(name)
+            if self.models.get(name) is not None:
+                self.previous[name] = (self.models[name], self.versions[name])
+            self.models[name] = model
+            self.versions[name] = info
+            return info
+
+    def _install(self, name, model, info):
+        # Caller holds self.lock; a single dict assignment publishes the new model
+        info["version"] = self.next_version
+        self.next_version += 1
+        self.history.setdefault(name, []).append(info)
+        if self.models.get(name) is not None:
+            self.previous[name] = (self.models[name], self.versions[name])
+        self.versions[name] = info
+        self.models[name] = model
+        self.failed.pop(name, None)
+
+    def _load(self, name, path):
+        start = time.perf_counter()
+        model, source = None, None
+        checksum = file_checksum(path) if os.path.exists(path) else None
+        if checksum is not None:
+            mmap_path = store_path(path, checksum)
+        else:
+            # Store deployed without its pickle: serve the newest one
+            stores = existing_stores(path)
+            mmap_path = stores[0] if stores else None
+
+        if self.use_mmap and mmap_path and os.path.exists(mmap_path):
+            try:
+                model, source = joblib.load(mmap_path, mmap_mode='r'), 'mmap'
+            except Exception as e:
+                print(f"Error loading model store {mmap_path}: {str(e)}")
+
+        if model is None and os.path.exists(path):
+            model, source = load_model(path), 'pickle'
+            if model is not None and (self.use_mmap or name in self.compiled):
+                try:
+                    if self.use_mmap:
+                        export_store(model, mmap_path)
+                        remove_stale_stores(path, mmap_path)
+                        model, source = joblib.load(mmap_path, mmap_mode='r'), 'mmap'
+                    else:
+                        model = CompiledTreeEnsemble.from_lgbm(model)
+                except Exception as e:
+                    print(f"Compiled engine unavailable for {name}, using LightGBM: {str(e)}")
+
+        if model is None:
+            print(f"Warning: {name} model could not be loaded from {path}")
+        else:
+            print(f"Loaded {name} model successfully ({source})")
+        return model, {
+            "version": None,
+            "path": path,
+            "checksum": checksum,
+            "source": source,
+            "loaded_at": datetime.now().isoformat(timespec='seconds'),
+            "load_seconds": time.perf_counter() - start
+        }
+
+    def status(self):
+        """
+        Load state, engine, version and cold-start time per model, without triggering loads
+        """
+        empty = {"version": None, "path": None, "checksum": None, "source": None,
+                 "loaded_at": None, "load_seconds": None}
+        return {
+            name: {
+                "loaded": self.is_loaded(name),
+                "engine": type(self.models[name]).__name__ if self.is_loaded(name) else None,
+                **self.versions.get(name, empty),
+                "previous_version": self.previous[name][1]["version"] if name in self.previous else None
+            }
+            for name in self.paths
+        }
+
+if __name__ == "__main__":
+    # Build the memory-mapped store for every available model
+    for name, path in MODEL_PATHS.items():
+        if not os.path.exists(path):
+            print(f"Skipping {name}: {path} not found")
+            continue
+        model = load_model(path)
+        if model is None:
+            continue
+        mmap_path = store_path(path, file_checksum(path))
+        export_store(model, mmap_path)
+        remove_stale_stores(path, mmap_path)
+        print(f"Wrote {mmap_path}")
@@ -0,0 +1,163 @@
+import json
+import multiprocessing
+import queue
+import numpy as np
+from data_sender import generate_random_fault_data_bulk
+from model_registry import ModelRegistry, MODEL_PATHS, feature_names
+
+# The server's streaming endpoint is optional; local scoring works without it
+try:
+    from websockets.sync.client import connect
+except ImportError:
+    connect = None
+
+# Dashboard machine names and the device types used by the generator and the API
+MACHINE_TYPES = {
+    "Air Handling Unit": "AHU",
+    "Chiller": "CHILLER",
+    "Generator": "GENERATOR"
+}
+
+class ReadingSource:
+    """
+    Simulated readings generated in bulk and handed out one at a time per device type
+    """
+    def __init__(self, buffer_size=256):
+        self.buffer_size = buffer_size
+        self.buffers = {}
+
+    def next(self, device_type):
+        buffer = self.buffers.get(device_type)
+        if not buffer:
+            buffer = generate_random_fault_data_bulk(device_type, self.buffer_size).to_dict(orient='records')
+            buffer.reverse()
+            self.buffers[device_type] = buffer
+        return buffer.pop()
+
+def model_features(data):
+    # Setpoints and timestamps are shown on the dashboard but are not model inputs
+    return {k: v for k, v in data.items() if not k.endswith('_setpoint') and k != 'timestamp'}
+
+def predict_reading(model, data):
+    """
+    (fault type, probability) for one reading from a single predict_proba call,
+    with the features in the order the model was trained with
+    """
+    features = model_features(data)
+    names = feature_names(model, list(features))
+    probabilities = model.predict_proba(np.array([[features[name] for name in names]], dtype=np.float64))[0]
+    best = probabilities.argmax()
+    return int(model.classes_[best]), float(probabilities[best])
+
+class LocalScorer:
+    """
+    Score readings with models loaded in the service process
+    """
+    def __init__(self):
+        self.models = ModelRegistry({machine: MODEL_PATHS[device_type.lower()]
+                                     for machine, device_type in MACHINE_TYPES.items()})
+
+    def score(self, readings):
+        results = []
+        for machine, data in readings:
+            model = self.models.get(machine)
+            if model is None:
+                results.append({"error": f"{machine} model not loaded"})
+                continue
+            fault_type, probability = predict_reading(model, data)
+            results.append({"fault_type": fault_type, "probability": probability})
+        return results
+
+class StreamScorer:
+    """
+    Score readings through the server's /ws/predict stream over one persistent connection
+    """
+    def __init__(self, url):
+        if connect is None:
+            raise ImportError("Scoring through the server requires the websockets package")
+        self.url = url
+        self.connection = None
+
+    def score(self, readings):
+        if self.connection is None:
+            self.connection = connect(self.url)
+        messages = [{"device_type": MACHINE_TYPES[machine], "unit_id": machine, "data": model_features(data)}
+                    for machine, data in readings]
+        try:
+            self.connection.send(json.dumps(messages))
+            results = []
+            while len(results) < len(messages):
+                results.extend(json.loads(self.connection.recv()))
+        except Exception:
+            self.close()
+            raise
+        return results
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+def run_service(results, stop, interval=5.0, url=None):
+    """
+    Service process loop: every `interval` seconds score one reading per machine
+    and put {"machine", "data", "prediction", "probability"} (or {"machine", "error"})
+    on the results queue. With `url` the server scores the readings, otherwise
+    the models are loaded in this process.
+    """
+    source = ReadingSource()
+    scorer = StreamScorer(url) if url else LocalScorer()
+    while not stop.is_set():
+        readings = [(machine, source.next(device_type)) for machine, device_type in MACHINE_TYPES.items()]
+        try:
+            scored = scorer.score(readings)
+        except Exception as e:
+            scored = [{"error": str(e)}] * len(readings)
+        for (machine, data), result in zip(readings, scored):
+            if "error" in result:
+                results.put({"machine": machine, "error": result["error"]})
+            else:
+                results.put({
+                    "machine": machine,
+                    "data": data,
+                    "prediction": result["fault_type"],
+                    "probability": result["probability"] * 100
+                })
+        stop.wait(interval)
+    if url:
+        scorer.close()
+
+class PredictionService:
+    """
+    Runs readings generation and scoring in a separate process so the dashboard
+    process only renders results. The dashboard drains the queue from its own
+    event loop; no model is loaded or run in the GUI process.
+    """
+    def __init__(self, interval=5.0, url=None, queue_size=10000):
+        context = multiprocessing.get_context("spawn")
+        self.results = context.Queue(maxsize=queue_size)
+        self.stop_event = context.Event()
+        self.process = context.Process(target=run_service, name="prediction-service",
+                                       args=(self.results, self.stop_event, interval, url), daemon=True)
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def drain(self, limit=500):
+        """
+        Up to `limit` results that are ready, without blocking
+        """
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
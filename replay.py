@@ -0,0 +1,216 @@
+import argparse
+import ast
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import requests
+from columnar import columnar_format, iter_columnar
+from model_registry import ModelRegistry, MODEL_PATHS, feature_names
+
+# Machine names used by the desktop UI report exports
+MACHINE_DEVICES = {
+    'Air Handling Unit': 'ahu',
+    'Chiller': 'chiller',
+    'Generator': 'generator'
+}
+
+# Columns that describe a reading rather than being model inputs
+REPORT_COLUMNS = {'timestamp', 'machine', 'prediction', 'probability', 'fault_type', 'parameters'}
+
+def device_from_path(path):
+    """
+    Device name from a data_genarator output name such as ahu_data.csv or chiller/part-00000.parquet
+    """
+    for part in reversed(os.path.normpath(path).lower().split(os.sep)):
+        for device in MODEL_PATHS:
+            if part.startswith(device):
+                return device
+    return None
+
+def read_chunks(path, chunk_size):
+    """
+    Stream a CSV, Parquet or Feather file of recorded readings in chunks
+    """
+    if columnar_format(path):
+        yield from iter_columnar(path, chunk_size)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+def normalize(chunk, device):
+    """
+    Add _device, _label and _time columns to a chunk of recorded readings.
+    Generator data is labelled by its fault_type column; UI report exports
+    (fault_report.csv/.parquet) by the prediction recorded at the time, so
+    replaying them measures agreement with the model that was running then.
+    """
+    if 'parameters' in chunk.columns:
+        parameters = pd.DataFrame([ast.literal_eval(value) for value in chunk['parameters']], index=chunk.index)
+        chunk = pd.concat([chunk.drop(columns='parameters'), parameters], axis=1)
+    if 'machine' in chunk.columns:
+        chunk = chunk.assign(_device=chunk['machine'].map(MACHINE_DEVICES), _label=chunk['prediction'])
+    else:
+        if device is None:
+            raise ValueError("Cannot tell the device type from the file name; pass --device")
+        chunk = chunk.assign(_device=device, _label=chunk['fault_type'])
+    if 'timestamp' in chunk.columns:
+        times = pd.to_datetime(chunk['timestamp']).to_numpy().astype('datetime64[ns]').astype(np.int64) / 1e9
+    else:
+        times = np.zeros(len(chunk))
+    return chunk.assign(_time=times)
+
+class LocalScorer:
+    """
+    Score readings in this process with models from the registry (or specific model files)
+    """
+    def __init__(self, paths):
+        self.registry = ModelRegistry(paths)
+
+    def score(self, device, frame):
+        model = self.registry.get(device)
+        if model is None:
+            raise RuntimeError(f"{device} model not loaded")
+        features = frame[feature_names(model)].to_numpy(dtype=np.float64)
+        return model.classes_[model.predict_proba(features).argmax(axis=1)]
+
+class HttpScorer:
+    """
+    Score readings through the server's batch endpoints over one pooled connection
+    """
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def score(self, device, frame):
+        inputs = frame.drop(columns=[c for c in frame.columns if c in REPORT_COLUMNS or c.startswith('_')])
+        response = self.session.post(f"{self.base_url}/predict/{device}/batch",
+                                     json=inputs.to_dict(orient='records'))
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return np.array([result['fault_type'] for result in response.json()['results']])
+
+class ReplayStats:
+    """
+    Readings, errors, scoring time and label/prediction confusion counts per device
+    """
+    def __init__(self):
+        self.devices = {}
+
+    def device(self, name):
+        return self.devices.setdefault(name, {"readings": 0, "errors": 0, "seconds": 0.0, "confusion": {}})
+
+    def record(self, name, labels, predictions, seconds):
+        stats = self.device(name)
+        stats["readings"] += len(labels)
+        stats["seconds"] += seconds
+        for label, prediction in zip(labels, predictions):
+            key = f"{int(label)}->{int(prediction)}"
+            stats["confusion"][key] = stats["confusion"].get(key, 0) + 1
+
+    def record_error(self, name, count, message):
+        stats = self.device(name)
+        stats["errors"] += count
+        stats["last_error"] = message
+
+    def report(self, elapsed):
+        devices = {}
+        for name, stats in self.devices.items():
+            correct = sum(count for key, count in stats["confusion"].items()
+                          if key.split("->")[0] == key.split("->")[1])
+            recall = {}
+            for key, count in stats["confusion"].items():
+                label = key.split("->")[0]
+                recall.setdefault(label, [0, 0])
+                recall[label][1] += count
+                if key.split("->")[1] == label:
+                    recall[label][0] += count
+            devices[name] = {
+                **stats,
+                "accuracy": correct / stats["readings"] if stats["readings"] else None,
+                "recall": {label: hits / total for label, (hits, total) in sorted(recall.items())},
+                "readings_per_second": stats["readings"] / stats["seconds"] if stats["seconds"] else None
+            }
+        total = sum(stats["readings"] for stats in self.devices.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "readings": total,
+            "throughput": total / elapsed if elapsed else None,
+            "devices": devices
+        }
+
+def replay(paths, scorer, speed=0.0, batch_size=256, chunk_size=100000, device=None):
+    """
+    Push recorded readings through a scorer in file order.
+    speed=1 follows the recorded timestamps in real time, speed=N runs N times
+    faster and speed=0 sends as fast as possible. Readings that are due together
+    are scored together, up to batch_size per call.
+    """
+    stats = ReplayStats()
+    start = time.perf_counter()
+    first_time = None
+    for path in paths:
+        for chunk in read_chunks(path, chunk_size):
+            chunk = normalize(chunk, device or device_from_path(path))
+            if first_time is None and len(chunk):
+                first_time = chunk['_time'].iloc[0]
+            due = start + np.abs(chunk['_time'].to_numpy() - first_time) / speed if speed > 0 else None
+            position = 0
+            while position < len(chunk):
+                end = min(position + batch_size, len(chunk))
+                if due is not None:
+                    wait = due[position] - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                    ready = due[position:end] <= time.perf_counter()
+                    ready[0] = True
+                    end = position + (len(ready) if ready.all() else int(np.argmin(ready)))
+                score_batch(chunk.iloc[position:end], scorer, stats)
+                position = end
+    return stats.report(time.perf_counter() - start)
+
+def score_batch(batch, scorer, stats):
+    for name, group in batch.groupby('_device', sort=False):
+        group = group.dropna(axis=1, how='all')
+        started = time.perf_counter()
+        try:
+            predictions = scorer.score(name, group)
+        except Exception as e:
+            stats.record_error(name, len(group), str(e))
+            continue
+        stats.record(name, group['_label'].to_numpy(), predictions, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded readings through a model and measure accuracy")
+    parser.add_argument("paths", nargs="+", help="CSV, Parquet or Feather files (generator output or report exports)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="1 replays in real time, N is N times faster, 0 (default) is as fast as possible")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=100000, help="rows read from disk at a time")
+    parser.add_argument("--device", choices=list(MODEL_PATHS), help="device type when it is not in the file name")
+    parser.add_argument("--base-url", help="score through a running server instead of in-process")
+    parser.add_argument("--model", action="append", default=[], metavar="DEVICE=PATH",
+                        help="model file to backtest for a device, e.g. ahu=models/old/ahu_model.pkl")
+    parser.add_argument("--report", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if args.base_url:
+        scorer = HttpScorer(args.base_url)
+    else:
+        model_paths = dict(MODEL_PATHS)
+        for override in args.model:
+            name, _, path = override.partition("=")
+            model_paths[name] = path
+        scorer = LocalScorer(model_paths)
+
+    result = replay(args.paths, scorer, args.speed, args.batch_size, args.chunk_size, args.device)
+    print(f"Replayed {result['readings']:,} readings in {result['elapsed_seconds']:.2f}s "
+          f"({result['throughput'] or 0:,.0f} readings/s)")
+    for name, stats in result["devices"].items():
+        accuracy = f"{stats['accuracy']:.2%}" if stats["accuracy"] is not None else "n/a"
+        print(f"{name:>10}: {stats['readings']:,} scored, {stats['errors']:,} errors, accuracy {accuracy}")
+        if stats.get("last_error"):
+            print(f"{'':>12}last error: {stats['last_error']}")
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump(result, file, indent=2)
@@ -0,0 +1,193 @@
+import numpy as np
+
+class RingBuffer:
+    """
+    The last `capacity` rows appended, in a preallocated NumPy array.
+    Every row is written twice (at i and i + capacity), so the rows in
+    insertion order are always one contiguous slice: append() is O(1) and
+    view() returns a read-only view without copying.
+    """
+    def __init__(self, capacity, dtype=np.float32, width=None, fill=0):
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1, got {capacity}")
+        self.capacity = capacity
+        shape = (2 * capacity,) if width is None else (2 * capacity, width)
+        self.data = np.full(shape, fill, dtype=dtype)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, row):
+        position = self.count % self.capacity
+        self.data[position] = row
+        self.data[position + self.capacity] = row
+        self.count += 1
+
+    def view(self):
+        """Rows oldest first"""
+        if self.count <= self.capacity:
+            rows = self.data[:self.count]
+        else:
+            start = self.count % self.capacity
+            rows = self.data[start:start + self.capacity]
+        rows = rows.view()
+        rows.flags.writeable = False
+        return rows
+
+    def last(self):
+        return self.data[(self.count - 1) % self.capacity]
+
+    def clear(self):
+        self.count = 0
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+def merge_buckets(older, newer):
+    """
+    Combine two consecutive buckets of (start, end, min, max, value sum,
+    setpoint sum, per-parameter counts, samples)
+    """
+    return [older[0], newer[1], np.fmin(older[2], newer[2]), np.fmax(older[3], newer[3]),
+            older[4] + newer[4], older[5] + newer[5], older[6] + newer[6], older[7] + newer[7]]
+
+class AggregateLevel:
+    """
+    One resolution of a TrendStore: buckets of `size` raw samples with the first
+    and last timestamp, per-parameter min, max and mean value and mean setpoint.
+    The bucket still being filled is kept in float64 accumulators.
+    """
+    def __init__(self, size, width, capacity):
+        self.size = size
+        self.start = RingBuffer(capacity, np.int64)
+        self.end = RingBuffer(capacity, np.int64)
+        self.min = RingBuffer(capacity, np.float32, width, fill=np.nan)
+        self.max = RingBuffer(capacity, np.float32, width, fill=np.nan)
+        self.mean = RingBuffer(capacity, np.float32, width, fill=np.nan)
+        self.setpoint = RingBuffer(capacity, np.float32, width, fill=np.nan)
+        self.open = None
+
+    def add(self, start, end, low, high, total, setpoint_total, counts, samples):
+        """
+        Merge a child bucket (or a single sample) into the open bucket; returns
+        the closed bucket in the same form once it holds `size` samples
+        """
+        bucket = [start, end, low, high, total, setpoint_total, counts, samples]
+        self.open = bucket if self.open is None else merge_buckets(self.open, bucket)
+        if self.open[7] < self.size:
+            return None
+        closed, self.open = self.open, None
+        start, end, low, high, total, setpoint_total, counts, _ = closed
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.append(start, end, low, high, total / counts, setpoint_total / counts)
+        return closed
+
+    def append(self, start, end, low, high, mean, setpoint):
+        self.start.append(start)
+        self.end.append(end)
+        self.min.append(low)
+        self.max.append(high)
+        self.mean.append(mean)
+        self.setpoint.append(setpoint)
+
+    def __len__(self):
+        return len(self.start)
+
+    def view(self, partial=None):
+        """
+        (start, end, min, max, mean, setpoint) arrays, oldest bucket first, with the
+        `partial` bucket (samples not yet in a closed bucket) appended if given;
+        copies only in that case
+        """
+        arrays = [buffer.view() for buffer in (self.start, self.end, self.min, self.max, self.mean, self.setpoint)]
+        if partial is None:
+            return tuple(arrays)
+        start, end, low, high, total, setpoint_total, counts, _ = partial
+        with np.errstate(invalid='ignore', divide='ignore'):
+            partial = [start, end, low, high, total / counts, setpoint_total / counts]
+        return tuple(np.concatenate([array, np.asarray(row, dtype=array.dtype)[np.newaxis]])
+                     for array, row in zip(arrays, partial))
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in (self.start, self.end, self.min, self.max, self.mean, self.setpoint))
+
+class TrendStore:
+    """
+    Trend history of one machine: timestamps (int64 nanoseconds since the epoch),
+    predicted fault type (int8) and the value and setpoint (float32) of every
+    tracked parameter. Parameters missing from a reading are stored as NaN.
+
+    With levels > 0 it also maintains min/max/mean aggregates over buckets of
+    factor, factor**2, ... raw samples, updated incrementally on every append,
+    so long windows can be drawn from a few thousand buckets while only
+    `capacity` raw samples are kept.
+    """
+    def __init__(self, parameters, capacity=100, levels=0, factor=4, level_capacity=2048):
+        self.parameters = list(parameters)
+        self.columns = {name: index for index, name in enumerate(self.parameters)}
+        width = len(self.parameters)
+        self.timestamps = RingBuffer(capacity, np.int64)
+        self.faults = RingBuffer(capacity, np.int8)
+        self.values = RingBuffer(capacity, np.float32, width, fill=np.nan)
+        self.setpoints = RingBuffer(capacity, np.float32, width, fill=np.nan)
+        self.levels = [AggregateLevel(factor ** (level + 1), width, level_capacity) for level in range(levels)]
+
+    @property
+    def capacity(self):
+        return self.timestamps.capacity
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp, fault, values, setpoints):
+        """
+        Add one sample; values and setpoints are sequences in parameter order
+        """
+        nanoseconds = np.datetime64(timestamp, 'ns').astype(np.int64)
+        self.timestamps.append(nanoseconds)
+        self.faults.append(fault)
+        self.values.append(values)
+        self.setpoints.append(setpoints)
+        if self.levels:
+            self.aggregate(nanoseconds, values, setpoints)
+
+    def aggregate(self, nanoseconds, values, setpoints):
+        # Each level closes a bucket every `factor` child buckets and passes it up
+        values = np.asarray(values, dtype=np.float64)
+        setpoints = np.asarray(setpoints, dtype=np.float64)
+        present = ~np.isnan(values)
+        bucket = (nanoseconds, nanoseconds, values, values, np.where(present, values, 0.0),
+                  np.where(present, np.nan_to_num(setpoints), 0.0), present.astype(np.int64), 1)
+        for level in self.levels:
+            bucket = level.add(*bucket)
+            if bucket is None:
+                break
+
+    def level(self, index):
+        """
+        Buckets of aggregate level `index` as (start, end, min, max, mean, setpoint),
+        oldest first; the last bucket holds the samples not yet in a closed one
+        """
+        partial = None
+        # Open buckets of finer levels hold the newest samples, disjoint from this level's
+        for level in self.levels[:index + 1]:
+            if level.open is not None:
+                partial = level.open if partial is None else merge_buckets(level.open, partial)
+        return self.levels[index].view(partial)
+
+    def times(self):
+        """Timestamps oldest first, as datetime64[ns] (a view, no copy)"""
+        return self.timestamps.view().view('datetime64[ns]')
+
+    def parameter(self, name):
+        """(values, setpoints) of one parameter, oldest first (views, no copy)"""
+        column = self.columns[name]
+        return self.values.view()[:, column], self.setpoints.view()[:, column]
+
+    @property
+    def nbytes(self):
+        raw = sum(buffer.nbytes for buffer in (self.timestamps, self.faults, self.values, self.setpoints))
+        return raw + sum(level.nbytes for level in self.levels)
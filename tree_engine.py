@@ -0,0 +1,163 @@
+import numpy as np
+
+# LightGBM missing value handling codes
+MISSING_NONE = 0
+MISSING_ZERO = 1
+MISSING_NAN = 2
+MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+ZERO_THRESHOLD = 1e-35
+
+class CompiledTreeEnsemble:
+    """
+    Gradient boosted trees flattened into NumPy arrays for batch scoring.
+
+    Every node of every tree lives in one set of flat arrays; children holds
+    the (left, right) pair of node i at positions 2*i and 2*i+1, and leaves
+    point to themselves. A batch is walked level by level with a handful of
+    vectorized gathers. The object mirrors the parts of the LGBMClassifier
+    interface used by the API (classes_, feature_name_, predict, predict_proba).
+    """
+    def __init__(self, feature, threshold, children, value, missing_type, default_left,
+                 roots, num_class, objective, sigmoid, average_output,
+                 classes, feature_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.missing_type = missing_type
+        self.default_left = default_left
+        self.roots = roots
+        self.num_class = num_class
+        self.objective = objective
+        self.sigmoid = sigmoid
+        self.average_output = average_output
+        self.classes_ = classes
+        self.feature_name_ = feature_names
+        self.n_features_in_ = len(feature_names)
+        self.has_missing = bool((missing_type != MISSING_NONE).any())
+        self.is_leaf = children[::2] == np.arange(len(feature))
+
+    @classmethod
+    def from_lgbm(cls, model):
+        """
+        Export a fitted LGBMClassifier (or raw Booster) into flat arrays
+        """
+        booster = getattr(model, 'booster_', model)
+        dump = booster.dump_model()
+        objective = dump['objective'].split()
+        if objective[0] not in ('multiclass', 'binary'):
+            raise NotImplementedError(f"Unsupported objective: {dump['objective']}")
+        sigmoid = 1.0
+        for option in objective[1:]:
+            if option.startswith('sigmoid:'):
+                sigmoid = float(option.split(':')[1])
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        missing_type, default_left, roots = [], [], []
+
+        def add_node(node):
+            index = len(feature)
+            feature.append(0)
+            threshold.append(0.0)
+            left.append(index)
+            right.append(index)
+            value.append(0.0)
+            missing_type.append(MISSING_NONE)
+            default_left.append(True)
+            if 'split_feature' not in node:
+                value[index] = node['leaf_value']
+                return index
+            if node['decision_type'] != '<=':
+                raise NotImplementedError("Categorical splits are not supported")
+            feature[index] = node['split_feature']
+            threshold[index] = node['threshold']
+            missing_type[index] = MISSING_TYPES[node['missing_type']]
+            default_left[index] = node['default_left']
+            left[index] = add_node(node['left_child'])
+            right[index] = add_node(node['right_child'])
+            return index
+
+        for tree in dump['tree_info']:
+            roots.append(add_node(tree['tree_structure']))
+
+        classes = getattr(model, 'classes_', None)
+        if classes is None:
+            classes = np.arange(max(dump['num_class'], 2))
+        return cls(
+            feature=np.asarray(feature, dtype=np.intp),
+            threshold=np.asarray(threshold, dtype=np.float64),
+            children=np.column_stack([left, right]).astype(np.intp).ravel(),
+            value=np.asarray(value, dtype=np.float64),
+            missing_type=np.asarray(missing_type, dtype=np.int8),
+            default_left=np.asarray(default_left, dtype=bool),
+            roots=np.asarray(roots, dtype=np.intp),
+            num_class=dump['num_tree_per_iteration'],
+            objective=objective[0],
+            sigmoid=sigmoid,
+            average_output=dump.get('average_output', False),
+            classes=np.asarray(classes),
+            feature_names=list(dump['feature_names'])
+        )
+
+    def leaf_nodes(self, X):
+        """
+        Walk every tree for every row and return the reached leaf indices (rows x trees).
+        Only (row, tree) pairs still sitting on a split are advanced at each level.
+        """
+        if hasattr(X, 'columns'):
+            X = X[self.feature_name_]
+        X = np.asarray(X, dtype=np.float64)
+        if not self.has_missing and np.isnan(X).any():
+            X = np.where(np.isnan(X), 0.0, X)
+        flat_X = np.ascontiguousarray(X).ravel()
+        num_trees = len(self.roots)
+        nodes = np.tile(self.roots, X.shape[0])
+        row_offsets = np.repeat(np.arange(X.shape[0], dtype=np.intp) * X.shape[1], num_trees)
+        active = np.flatnonzero(~self.is_leaf.take(nodes))
+        while active.size:
+            current = nodes.take(active)
+            values = flat_X.take(row_offsets.take(active) + self.feature.take(current))
+            go_right = values > self.threshold.take(current)
+            if self.has_missing:
+                missing = self.missing_type.take(current)
+                is_nan = np.isnan(values)
+                values = np.where(is_nan & (missing != MISSING_NAN), 0.0, values)
+                go_right = values > self.threshold.take(current)
+                use_default = ((missing == MISSING_ZERO) & (np.abs(values) <= ZERO_THRESHOLD)) | \
+                              ((missing == MISSING_NAN) & is_nan)
+                go_right = np.where(use_default, ~self.default_left.take(current), go_right)
+            current = self.children.take(current * 2 + go_right)
+            nodes[active] = current
+            active = active[~self.is_leaf.take(current)]
+        return nodes.reshape(X.shape[0], num_trees)
+
+    def predict_raw(self, X):
+        """
+        Raw per-class scores, summed over boosting iterations
+        """
+        leaf_values = self.value[self.leaf_nodes(X)]
+        raw = leaf_values.reshape(leaf_values.shape[0], -1, self.num_class).sum(axis=1)
+        if self.average_output:
+            raw /= len(self.roots) // self.num_class
+        return raw
+
+    def predict_proba(self, X):
+        raw = self.predict_raw(X)
+        if self.objective == 'binary':
+            positive = 1.0 / (1.0 + np.exp(-self.sigmoid * raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        raw = raw - raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def verify(model, compiled, X, atol=1e-6):
+    """
+    Largest absolute probability difference between the original and compiled model
+    """
+    difference = np.abs(model.predict_proba(X) - compiled.predict_proba(X)).max()
+    if difference > atol:
+        raise AssertionError(f"Compiled model deviates by {difference:.3g} (tolerance {atol:g})")
+    return difference
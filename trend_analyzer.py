@@ -1,35 +1,33 @@
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
-from collections import deque
 from datetime import datetime, timedelta
 import customtkinter as ctk
 import numpy as np
-from matplotlib.dates import DateFormatter
+from matplotlib.dates import DateFormatter, date2num
+from timeseries import TrendStore
+
+# Smallest time axis span in days (five minutes), the share of it kept free on the
+# right, and the value-axis margin as a share of the value range
+TREND_MIN_SPAN = 5 / 1440
+TREND_HEADROOM = 0.25
+TREND_MARGIN = 0.25
+
+# Time windows offered on the trend graphs, in seconds. Live is the raw history
+# ring buffer (the last TREND_HISTORY readings); All is everything since startup
+TREND_WINDOWS = {"Live": None, "1 h": 3600, "Shift": 8 * 3600, "Day": 86400, "Week": 7 * 86400, "All": np.inf}
+# Most points drawn per line; longer windows are drawn from min/max aggregates
+TREND_MAX_POINTS = 4000
+# Aggregate levels kept per machine (buckets of 4, 16, ... 4096 samples, 2048 buckets each)
+TREND_LEVELS = 6
+TREND_FACTOR = 4
+TREND_LEVEL_CAPACITY = 2048
 
 class TrendAnalyzer:
-    def __init__(self):
-        # Initialize trend data storage
-        self.trend_data = {
-            "Air Handling Unit": {
-                "timestamps": deque(maxlen=100),
-                "faults": deque(maxlen=100),
-                "fault_counts": {0: 0, 1: 0, 2: 0, 3: 0, 4: 0},
-                "parameter_history": {}  # For storing parameter values
-            },
-            "Chiller": {
-                "timestamps": deque(maxlen=100),
-                "faults": deque(maxlen=100),
-                "fault_counts": {0: 0, 1: 0, 2: 0, 3: 0, 4: 0},
-                "parameter_history": {}
-            },
-            "Generator": {
-                "timestamps": deque(maxlen=100),
-                "faults": deque(maxlen=100),
-                "fault_counts": {0: 0, 1: 0, 2: 0, 3: 0, 4: 0},
-                "parameter_history": {}
-            }
-        }
+    def __init__(self, incremental=True, capacity=100):
+        # Incremental mode updates persistent artists and blits them; otherwise
+        # every update clears and replots all axes
+        self.incremental = incremental
         
         # Store references to UI elements
         self.machine_frames = {}
@@ -98,6 +96,21 @@ class TrendAnalyzer:
                 ("fuel_level", "fuel_level_setpoint")
             ]
         }
+        
+        # Initialize trend data storage: the last `capacity` samples per machine
+        # in preallocated NumPy ring buffers, plus min/max/mean aggregates for long windows
+        self.trend_data = {
+            machine: {
+                "samples": TrendStore([param for param, setpoint_param in parameters], capacity,
+                                      levels=TREND_LEVELS, factor=TREND_FACTOR,
+                                      level_capacity=TREND_LEVEL_CAPACITY),
+                "fault_counts": {0: 0, 1: 0, 2: 0, 3: 0, 4: 0}
+            }
+            for machine, parameters in self.tracked_parameters.items()
+        }
+        
+        # Selected trend window per machine (a TREND_WINDOWS value)
+        self.trend_windows = {machine: None for machine in self.tracked_parameters}
 
     def create_trend_graphs(self, machine_container, machine):
         """Create trend visualization components for a machine"""
@@ -110,6 +123,25 @@ class TrendAnalyzer:
                                   text_color="#00FF00")
         trend_title.pack(pady=5)
         
+        window_selector = ctk.CTkSegmentedButton(trend_frame, values=list(TREND_WINDOWS),
+                                                 command=lambda label: self.set_trend_window(machine, label))
+        window_selector.set("Live")
+        window_selector.pack(pady=(0, 5))
+        
+        fig, axes = self.create_trend_figure(machine)
+        
+        # Create canvas with scrollable container
+        canvas_frame = ctk.CTkScrollableFrame(trend_frame, fg_color="#1B1B1B")
+        canvas_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        
+        canvas = FigureCanvasTkAgg(fig, master=canvas_frame)
+        self.attach_trend_canvas(machine, canvas, axes)
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+        
+        return trend_frame
+
+    def create_trend_figure(self, machine):
+        """Create the trend figure with one styled subplot per tracked parameter"""
         # Create matplotlib figure with subplots
         num_params = len(self.tracked_parameters[machine])
         fig = Figure(figsize=(6, 2*num_params), facecolor='#1B1B1B')  # Adjust figure height based on parameters
@@ -126,18 +158,10 @@ class TrendAnalyzer:
                 spine.set_color('white')
             ax.grid(True, linestyle='--', alpha=0.3)
         
-        # Create canvas with scrollable container
-        canvas_frame = ctk.CTkScrollableFrame(trend_frame, fg_color="#1B1B1B")
-        canvas_frame.pack(fill="both", expand=True, padx=5, pady=5)
-        
-        canvas = FigureCanvasTkAgg(fig, master=canvas_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
-        
-        # Initialize parameter history
-        for param, setpoint_param in self.tracked_parameters[machine]:
-            self.trend_data[machine]["parameter_history"][param] = deque(maxlen=100)
-        
+        return fig, axes
+
+    def attach_trend_canvas(self, machine, canvas, axes):
+        """Register the canvas a machine's trends are drawn on (Tk, or Agg for benchmarks)"""
         # Store references
         if machine not in self.machine_frames:
             self.machine_frames[machine] = {}
@@ -147,28 +171,204 @@ class TrendAnalyzer:
             "trend_axes": axes
         })
         
-        return trend_frame
+        if self.incremental:
+            self.create_trend_artists(machine)
+        canvas.draw()
+
+    def create_trend_artists(self, machine):
+        """Create the persistent lines, titles and legends that incremental updates reuse"""
+        frames = self.machine_frames[machine]
+        canvas = frames["trend_canvas"]
+        artists = {}
+        for ax, (param, setpoint_param) in zip(frames["trend_axes"], self.tracked_parameters[machine]):
+            # Animated artists are left out of full draws and blitted over the cached background
+            actual, = ax.plot([], [], '-', color='#00FF00', linewidth=2, label='Actual', animated=True)
+            setpoint, = ax.plot([], [], '--', color='#FFA500', linewidth=1.5, label='Setpoint', animated=True)
+            value = ax.annotate('', (0, 0),
+                                textcoords="offset points",
+                                xytext=(0,5),
+                                ha='center',
+                                color='#00FFFF',
+                                fontsize=6,
+                                animated=True)
+            value.set_visible(False)
+            ax.set_title(param.replace('_', ' ').title(), color='white', pad=5, fontsize=8)
+            legend = ax.legend(fontsize=6, facecolor='#2B2B2B', edgecolor='white')
+            for handle in legend.legend_handles:
+                handle.set_animated(False)  # legend samples copy the animated flag
+            ax.tick_params(colors='white', labelsize=6)
+            ax.xaxis.set_major_formatter(DateFormatter('%H:%M:%S'))
+            artists[param] = (actual, setpoint, value)
+        
+        frames["trend_artists"] = artists
+        frames["trend_background"] = None
+        canvas.figure.tight_layout()
+        
+        # Every full draw refreshes the cached background; layout is only recomputed on resize
+        canvas.mpl_connect('draw_event', lambda event: self.cache_trend_background(machine))
+        canvas.mpl_connect('resize_event', lambda event: canvas.figure.tight_layout())
+
+    def cache_trend_background(self, machine):
+        frames = self.machine_frames[machine]
+        canvas = frames["trend_canvas"]
+        frames["trend_background"] = canvas.copy_from_bbox(canvas.figure.bbox)
+        self.draw_trend_artists(machine)
+
+    def draw_trend_artists(self, machine):
+        for artists in self.machine_frames[machine]["trend_artists"].values():
+            for artist in artists:
+                artist.axes.draw_artist(artist)
 
     def update_trends(self, machine, prediction, data=None, timestamp=None):
         """Update trend data and visualizations for a machine"""
+        self.record_sample(machine, prediction, data, timestamp)
+        self.refresh_trends(machine)
+        
+        # Update statistics with prediction
+        self.update_statistics(machine, prediction)
+
+    def record_sample(self, machine, prediction, data=None, timestamp=None):
+        """Add a sample to the trend data without drawing anything"""
         if timestamp is None:
             timestamp = datetime.now()
         
+        # Parameters without both a value and a setpoint in the reading are stored as NaN
+        values, setpoints = [], []
+        for param, setpoint_param in self.tracked_parameters[machine]:
+            if data and param in data and setpoint_param in data:
+                values.append(data[param])
+                setpoints.append(data[setpoint_param])
+            else:
+                values.append(np.nan)
+                setpoints.append(np.nan)
+        
         # Update trend data
-        self.trend_data[machine]["timestamps"].append(timestamp)
-        self.trend_data[machine]["faults"].append(prediction)
+        self.trend_data[machine]["samples"].append(timestamp, prediction, values, setpoints)
         self.trend_data[machine]["fault_counts"][prediction] += 1
+
+    def refresh_trends(self, machine):
+        """Draw the parameter trends for the recorded samples"""
+        if self.incremental:
+            self.render_trends(machine)
+        else:
+            self.redraw_trends(machine)
+
+    def set_trend_window(self, machine, label):
+        """Show the last TREND_WINDOWS[label] of a machine's history"""
+        self.trend_windows[machine] = TREND_WINDOWS[label]
+        if machine in self.machine_frames:
+            self.machine_frames[machine]["trend_refit"] = True
+        if len(self.trend_data[machine]["samples"]):
+            self.refresh_trends(machine)
+
+    def trend_series(self, machine):
+        """
+        (times, values, setpoint times, setpoints) to draw for the selected window,
+        times as int64 nanoseconds and one value/setpoint column per parameter.
+        Live draws the raw ring buffer (its last TREND_MAX_POINTS samples). Other
+        windows use raw samples while they cover the window in at most
+        TREND_MAX_POINTS; otherwise the finest aggregate level that does, with each
+        bucket drawn as its min and max (so spikes survive) and the mean setpoint.
+        """
+        samples = self.trend_data[machine]["samples"]
+        window = self.trend_windows[machine]
+        times = samples.timestamps.view()
+        if window is None:
+            first = max(len(times) - TREND_MAX_POINTS, 0)
+            return times[first:], samples.values.view()[first:], times[first:], samples.setpoints.view()[first:]
+        if np.isinf(window):
+            # All history: back to the oldest sample any level still covers
+            start = min([times[0]] + [level.start.view()[0] for level in samples.levels if len(level)])
+        else:
+            start = times[-1] - int(window * 1e9)
+        
+        first = np.searchsorted(times, start)
+        complete = times[0] <= start or samples.timestamps.count <= samples.capacity
+        if not samples.levels or (complete and len(times) - first <= TREND_MAX_POINTS):
+            return times[first:], samples.values.view()[first:], times[first:], samples.setpoints.view()[first:]
+        
+        for index, level in enumerate(samples.levels):
+            bucket_start, bucket_end, low, high, mean, setpoint = samples.level(index)
+            first = np.searchsorted(bucket_end, start)
+            complete = bucket_start[0] <= start or level.start.count <= level.start.capacity
+            if (complete and 2 * (len(bucket_start) - first) <= TREND_MAX_POINTS) or index == len(samples.levels) - 1:
+                bucket_times = np.column_stack([bucket_start[first:], bucket_end[first:]]).ravel()
+                envelope = np.stack([low[first:], high[first:]], axis=1).reshape(-1, low.shape[1])
+                return bucket_times, envelope, bucket_start[first:], setpoint[first:]
+
+    def render_trends(self, machine):
+        """
+        Update the persistent lines in place and blit them over the cached background.
+        A full redraw only happens when a point falls outside the current axis limits.
+        """
+        frames = self.machine_frames[machine]
+        canvas = frames["trend_canvas"]
+        samples = self.trend_data[machine]["samples"]
+        if not len(samples):
+            return
+        times, values, setpoint_times, setpoints = self.trend_series(machine)
+        times = date2num(times.view('datetime64[ns]'))
+        setpoint_times = date2num(setpoint_times.view('datetime64[ns]'))
+        latest = samples.values.last()
+        
+        window = self.trend_windows[machine]
+        start = times[-1] - window / 86400 if window is not None and np.isfinite(window) else times[0]
+        moved = self.fit_time_limits(frames["trend_axes"], start, times[-1], force=frames.pop("trend_refit", False))
+        rescaled = moved
+        for ax, (param, setpoint_param) in zip(frames["trend_axes"], self.tracked_parameters[machine]):
+            column = samples.columns[param]
+            if np.isnan(values[:, column]).all():
+                continue
+            actual, setpoint, value = frames["trend_artists"][param]
+            actual.set_data(times, values[:, column])
+            setpoint.set_data(setpoint_times, setpoints[:, column])
+            value.xy = (times[-1], latest[column])
+            value.set_text(f'{latest[column]:.2f}')
+            value.set_visible(not np.isnan(latest[column]))
+            rescaled = self.fit_value_limits(ax, values[:, column], setpoints[:, column], refit=moved) or rescaled
         
-        # Update parameter history if data is provided
-        if data:
-            for param, setpoint_param in self.tracked_parameters[machine]:
-                # Ensure both parameter and setpoint exist in data
-                if param in data and setpoint_param in data:
-                    # Store both value and setpoint
-                    self.trend_data[machine]["parameter_history"].setdefault(param, deque(maxlen=100)).append(
-                        (data[param], data[setpoint_param])
-                    )
-        
+        try:
+            if rescaled or frames["trend_background"] is None:
+                canvas.draw()
+            else:
+                canvas.restore_region(frames["trend_background"])
+                self.draw_trend_artists(machine)
+                canvas.blit(canvas.figure.bbox)
+        except Exception as e:
+            print(f"Graph update warning: {str(e)}")
+
+    def fit_time_limits(self, axes, start, end, force=False):
+        """
+        Move the shared time window (start to end, in Matplotlib date numbers) when the
+        newest sample passes its right edge, leaving headroom so this stays rare.
+        Returns True if the limits changed.
+        """
+        left, right = axes[0].get_xlim()
+        if not force and left <= start and end <= right:
+            return False
+        span = max(end - start, TREND_MIN_SPAN)
+        time_format = '%d %b %H:%M' if span > 1 else '%H:%M:%S'
+        for ax in axes:
+            ax.set_xlim(start, end + span * TREND_HEADROOM)
+            ax.xaxis.set_major_formatter(DateFormatter(time_format))
+        return True
+
+    def fit_value_limits(self, ax, values, setpoints, refit=False):
+        """
+        Refit the value axis to the history when a value falls outside it (or when
+        refit is set, so the range can also shrink). Returns True if the limits changed.
+        """
+        bottom, top = ax.get_ylim()
+        low = float(np.nanmin([np.nanmin(values), np.nanmin(setpoints)]))
+        high = float(np.nanmax([np.nanmax(values), np.nanmax(setpoints)]))
+        if not refit and bottom <= low and high <= top:
+            return False
+        pad = (high - low) * TREND_MARGIN or max(abs(high) * 0.05, 0.5)
+        ax.set_ylim(low - pad, high + pad)
+        return True
+
+    def redraw_trends(self, machine):
+        """Clear and replot every axis (rendering used before incremental updates)"""
         # Get canvas and axes
         canvas = self.machine_frames[machine]["trend_canvas"]
         axes = self.machine_frames[machine]["trend_axes"]
@@ -177,21 +377,22 @@ class TrendAnalyzer:
         for ax in axes:
             ax.clear()
         
-        # Get timestamps list
-        timestamps = list(self.trend_data[machine]["timestamps"])
+        # Get timestamps
+        samples = self.trend_data[machine]["samples"]
+        times, values, setpoint_times, setpoints = self.trend_series(machine)
+        timestamps = times.view('datetime64[ns]')
+        setpoint_times = setpoint_times.view('datetime64[ns]')
+        latest = samples.values.last()
         
         # Plot parameter trends
         for idx, (param, setpoint_param) in enumerate(self.tracked_parameters[machine]):
-            history = self.trend_data[machine]["parameter_history"].get(param, [])
-            if len(history) >= 2:  # Need at least 2 points to plot
-                values = [h[0] for h in history]
-                setpoints = [h[1] for h in history]
-                
+            column = samples.columns[param]
+            if len(timestamps) >= 2:  # Need at least 2 points to plot
                 # Plot actual values
-                axes[idx].plot(timestamps[-len(values):], values, '-', color='#00FF00', linewidth=2, label='Actual')
+                axes[idx].plot(timestamps, values[:, column], '-', color='#00FF00', linewidth=2, label='Actual')
                 
                 # Plot setpoints
-                axes[idx].plot(timestamps[-len(setpoints):], setpoints, '--', color='#FFA500', linewidth=1.5, label='Setpoint')
+                axes[idx].plot(setpoint_times, setpoints[:, column], '--', color='#FFA500', linewidth=1.5, label='Setpoint')
                 
                 # Configure plot
                 axes[idx].set_title(param.replace('_', ' ').title(), color='white', pad=5, fontsize=8)
@@ -199,9 +400,9 @@ class TrendAnalyzer:
                 axes[idx].legend(fontsize=6, facecolor='#2B2B2B', edgecolor='white')
                 
                 # Add current value annotation
-                if values:
-                    axes[idx].annotate(f'{values[-1]:.2f}', 
-                                     (timestamps[-1], values[-1]),
+                if not np.isnan(latest[column]):
+                    axes[idx].annotate(f'{latest[column]:.2f}', 
+                                     (timestamps[-1], latest[column]),
                                      textcoords="offset points",
                                      xytext=(0,5),
                                      ha='center',
@@ -221,9 +422,6 @@ class TrendAnalyzer:
             canvas.draw()
         except Exception as e:
             print(f"Graph update warning: {str(e)}")
-        
-        # Update statistics with prediction
-        self.update_statistics(machine, prediction)
 
     def update_statistics(self, machine, prediction):
         """Update both histogram and trend graphs"""
@@ -259,10 +457,11 @@ class TrendAnalyzer:
             ax = self.fault_trends[machine]['ax']
             ax.clear()
             
-            timestamps = list(self.trend_data[machine]['timestamps'])
-            faults = list(self.trend_data[machine]['faults'])
+            samples = self.trend_data[machine]['samples']
+            timestamps = samples.times()
+            faults = samples.faults.view()
             
-            if timestamps and faults:
+            if len(samples):
                 ax.plot(timestamps, faults, '-', color='#FF5555', linewidth=2)
                 ax.set_ylim(-0.5, 4.5)
                 ax.set_yticks(range(5))
@@ -1,21 +1,100 @@
 # ui.py
 import customtkinter as ctk
-import joblib
+import os
 import pandas as pd
 import numpy as np
 from tkinter import messagebox
 import time
-from data_sender import generate_random_fault_data
+import queue
 import threading
 from trend_analyzer import TrendAnalyzer
 from tkinter import ttk
 from datetime import datetime
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from model_registry import ModelRegistry, MODEL_PATHS
+from columnar import write_columnar
+from prediction_service import PredictionService, ReadingSource, MACHINE_TYPES, predict_reading
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+# Seconds between readings per machine
+MONITOR_INTERVAL = float(os.getenv("MONITOR_INTERVAL", "5"))
+# Empty: score in a background thread of this process. "process": score in a
+# separate service process. A ws:// URL (e.g. ws://localhost:8000/ws/predict):
+# the service process scores through the API server's prediction stream.
+PREDICTION_SERVICE = os.getenv("PREDICTION_SERVICE", "")
+# How often new results are collected, the most frames drawn per second, and
+# the minimum seconds between rebuilds of the (widget-heavy) report table
+RESULT_POLL_MS = int(os.getenv("RESULT_POLL_MS", "100"))
+UI_MAX_FPS = float(os.getenv("UI_MAX_FPS", "10"))
+REPORT_REFRESH_SECONDS = float(os.getenv("REPORT_REFRESH_SECONDS", "2"))
+# Samples of trend history kept per machine (e.g. 720 is one hour at 5 second readings)
+TREND_HISTORY = int(os.getenv("TREND_HISTORY", "100"))
+
+class RenderScheduler:
+    """
+    Coalesces UI updates and renders them at a bounded frame rate.
+    New results only mark what changed (per view, per machine); a frame renders
+    the pending changes of the visible view once, however many results arrived.
+    Hidden views keep their pending changes and catch up when they are shown.
+    """
+    def __init__(self, window, max_fps=10):
+        self.window = window
+        self.frame_interval = 1 / max_fps
+        self.renderers = {}
+        self.pending = {}
+        self.last_render = {}
+        self.visible = None
+        self.scheduled = None
+
+    def register(self, view, render, min_interval=0.0):
+        """render(keys) draws the given pending keys of a view"""
+        self.renderers[view] = (render, max(min_interval, self.frame_interval))
+        self.pending.setdefault(view, set())
+        self.last_render.setdefault(view, 0.0)
+
+    def mark(self, view, key):
+        self.pending.setdefault(view, set()).add(key)
+        if view == self.visible:
+            self.schedule()
+
+    def show(self, view):
+        self.visible = view
+        if self.scheduled is not None:
+            # The frame was timed for the previous view
+            self.window.after_cancel(self.scheduled)
+            self.scheduled = None
+        if self.pending.get(view):
+            self.schedule()
+
+    def rendered(self, view):
+        """Note that a view was just drawn in full outside the scheduler"""
+        self.pending[view] = set()
+        self.last_render[view] = time.monotonic()
+
+    def schedule(self):
+        if self.scheduled is not None or self.visible not in self.renderers:
+            return
+        _, interval = self.renderers[self.visible]
+        wait = self.last_render[self.visible] + interval - time.monotonic()
+        self.scheduled = self.window.after(max(0, int(wait * 1000)), self.render_frame)
+
+    def render_frame(self):
+        self.scheduled = None
+        view = self.visible
+        keys = self.pending.get(view)
+        if not keys or view not in self.renderers:
+            return
+        self.pending[view] = set()
+        self.last_render[view] = time.monotonic()
+        render, _ = self.renderers[view]
+        try:
+            render(keys)
+        except Exception as e:
+            print(f"Render error in {view}: {str(e)}")
+
 class FaultDetectionApp:
     def __init__(self):
         self.window = ctk.CTk()
@@ -24,6 +103,19 @@ class FaultDetectionApp:
         
         # Add prediction history storage
         self.prediction_history = []
+
+        # Simulated readings generated in bulk and consumed one per machine per tick
+        self.readings = ReadingSource()
+
+        # Results from the monitoring thread, collected on the Tk thread by poll_predictions
+        self.incoming = queue.SimpleQueue()
+        # Most recent result per machine, drawn by render_machine
+        self.latest_status = {}
+        self.render_scheduler = RenderScheduler(self.window, UI_MAX_FPS)
+        self.render_scheduler.register('dashboard', self.render_dashboard)
+        self.render_scheduler.register('statistics', self.render_statistics)
+        self.render_scheduler.register('report', lambda keys: self.update_report_display(),
+                                       min_interval=REPORT_REFRESH_SECONDS)
         
         # Update setpoint ranges for all parameters
         self.setpoint_ranges = {
@@ -99,30 +191,33 @@ class FaultDetectionApp:
         }
         
         # Initialize trend analyzer
-        self.trend_analyzer = TrendAnalyzer()
+        self.trend_analyzer = TrendAnalyzer(capacity=TREND_HISTORY)
         
         # Create the main layout with navbar
         self.create_navbar_layout()
         
-        # Load models
-        try:
-            self.models = {
-                "Air Handling Unit": joblib.load("models/ahu_model.pkl"),
-                "Chiller": joblib.load("models/chiller_model.pkl"),
-                "Generator": joblib.load("models/generator_model.pkl")
-            }
-            print("Models loaded successfully")
-        except Exception as e:
-            print(f"Error loading models: {str(e)}")
-            messagebox.showerror("Error", f"Failed to load models: {str(e)}")
-            return
-        
-        # Start monitoring thread
+        # Models are loaded lazily by the monitoring thread on first use;
+        # MODEL_STORE_MMAP=1 shares the memory-mapped store with the API server
+        self.models = ModelRegistry({
+            "Air Handling Unit": MODEL_PATHS['ahu'],
+            "Chiller": MODEL_PATHS['chiller'],
+            "Generator": MODEL_PATHS['generator']
+        }, use_mmap=os.getenv("MODEL_STORE_MMAP", "0") == "1")
+
         self.monitoring_active = True
-        self.monitor_thread = threading.Thread(target=self.continuous_monitoring)
-        self.monitor_thread.daemon = True
-        self.monitor_thread.start()
-        
+        self.prediction_service = None
+        if PREDICTION_SERVICE:
+            # Readings are scored in a separate process (locally or through the
+            # server's /ws/predict stream); this process only renders the results
+            url = PREDICTION_SERVICE if PREDICTION_SERVICE.startswith(("ws://", "wss://")) else None
+            self.prediction_service = PredictionService(MONITOR_INTERVAL, url).start()
+        else:
+            # Start monitoring thread
+            self.monitor_thread = threading.Thread(target=self.continuous_monitoring)
+            self.monitor_thread.daemon = True
+            self.monitor_thread.start()
+        self.window.after(RESULT_POLL_MS, self.poll_predictions)
+
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.window.mainloop()
 
@@ -422,6 +517,7 @@ class FaultDetectionApp:
             view.pack_forget()
         # Show dashboard
         self.views['dashboard'].pack(fill="both", expand=True)
+        self.render_scheduler.show('dashboard')
 
     def show_settings(self):
         # Hide all views
@@ -429,6 +525,7 @@ class FaultDetectionApp:
             view.pack_forget()
         # Show settings
         self.views['settings'].pack(fill="both", expand=True)
+        self.render_scheduler.show('settings')
 
     def show_statistics(self):
         # Hide all views
@@ -438,6 +535,7 @@ class FaultDetectionApp:
         if 'statistics' not in self.views:
             self.views['statistics'] = self.create_statistics()
         self.views['statistics'].pack(fill="both", expand=True)
+        self.render_scheduler.show('statistics')
 
     def show_report(self):
         # Hide all views
@@ -446,7 +544,9 @@ class FaultDetectionApp:
         # Show report
         if 'report' not in self.views:
             self.views['report'] = self.create_report()
+            self.render_scheduler.rendered('report')
         self.views['report'].pack(fill="both", expand=True)
+        self.render_scheduler.show('report')
 
     def create_report(self):
         # Create report frame
@@ -466,6 +566,11 @@ class FaultDetectionApp:
                                  fg_color="#2B579A", hover_color="#1E3D6B")
         export_btn.pack(side="right", padx=5)
 
+        parquet_btn = ctk.CTkButton(control_frame, text="📦 Export Parquet",
+                                  command=self.export_report_columnar,
+                                  fg_color="#2B579A", hover_color="#1E3D6B")
+        parquet_btn.pack(side="right", padx=5)
+
         # Add search/filter controls
         filter_frame = ctk.CTkFrame(control_frame, fg_color="transparent")
         filter_frame.pack(side="right", padx=10)
@@ -547,6 +652,20 @@ class FaultDetectionApp:
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export: {str(e)}")
 
+    def report_frame(self):
+        """Prediction history with each parameter flattened into its own column"""
+        df = pd.DataFrame(self.prediction_history)
+        parameters = pd.DataFrame(df.pop('parameters').tolist(), index=df.index)
+        return pd.concat([df, parameters], axis=1)
+
+    def export_report_columnar(self):
+        try:
+            write_columnar(self.report_frame(), 'fault_report.parquet')
+            messagebox.showinfo("Export Successful",
+                              "Report exported to fault_report.parquet")
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Failed to export: {str(e)}")
+
     def update_report_display(self):
         # Clear existing entries
         for widget in self.table_frame.winfo_children():
@@ -725,12 +844,12 @@ class FaultDetectionApp:
         label.configure(text=f"{value:.1f}")
 
     def update_status(self, machine, data, prediction, probability):
-        if not self.window.winfo_exists():
-            return
-            
+        """Record a prediction and mark the views that show it for redrawing"""
+        timestamp = datetime.now()
+        
         # Store prediction in history
         self.prediction_history.append({
-            'timestamp': datetime.now(),
+            'timestamp': timestamp,
             'machine': machine,
             'prediction': prediction,
             'probability': probability,
@@ -742,7 +861,33 @@ class FaultDetectionApp:
         if len(self.prediction_history) > 100:
             self.prediction_history = self.prediction_history[-100:]
         
+        self.latest_status[machine] = {'data': data, 'prediction': prediction, 'probability': probability}
+        self.trend_analyzer.record_sample(machine, prediction, data=data, timestamp=timestamp)
+        for view in ('dashboard', 'statistics', 'report'):
+            self.render_scheduler.mark(view, machine)
+
+    def render_dashboard(self, machines):
+        for machine in machines:
+            self.render_machine(machine)
+
+    def render_statistics(self, machines):
+        for machine in machines:
+            samples = self.trend_analyzer.trend_data[machine]["samples"]
+            if len(samples):
+                self.trend_analyzer.update_statistics(machine, int(samples.faults.last()))
+
+    def render_machine(self, machine):
+        """Draw the latest status, parameters and trends of a machine"""
+        if not self.window.winfo_exists():
+            return
+        
         frame = self.machine_frames[machine]
+        status = self.latest_status[machine]
+        if 'error' in status:
+            frame["status"].configure(text="ERROR", text_color="#FFA500")
+            frame["fault_type"].configure(text=f"Error: {status['error']}", text_color="#FFA500")
+            return
+        data, prediction, probability = status['data'], status['prediction'], status['probability']
         
         # Update status with LED-like indicator
         if prediction == 0:
@@ -897,61 +1042,69 @@ class FaultDetectionApp:
                 row_data['trend'].grid_remove()
         
         # Update trends
-        self.trend_analyzer.update_trends(machine, prediction, data=data)
+        self.trend_analyzer.refresh_trends(machine)
 
     def continuous_monitoring(self):
         while self.monitoring_active:
             try:
                 # Generate and predict for each machine
-                machine_types = {
-                    "Air Handling Unit": "AHU",
-                    "Chiller": "CHILLER",
-                    "Generator": "GENERATOR"
-                }
-                
-                for machine, device_type in machine_types.items():
+                for machine, device_type in MACHINE_TYPES.items():
                     try:
                         # Generate data
-                        data = generate_random_fault_data(device_type)
+                        data = self.readings.next(device_type)
                         
-                        # Filter out setpoint parameters for model prediction
-                        features_dict = {
-                            k: v for k, v in data.iloc[0].to_dict().items() 
-                            if not k.endswith('_setpoint') and k != 'timestamp'
-                        }
+                        model = self.models.get(machine)
+                        if model is None:
+                            raise RuntimeError(f"{machine} model not loaded")
                         
-                        # Make prediction with original parameters only
-                        features_df = pd.DataFrame([features_dict])
-                        prediction = self.models[machine].predict(features_df)[0]
-                        probability = np.max(self.models[machine].predict_proba(features_df)) * 100
+                        # Predict from the original parameters only (setpoints are dropped)
+                        prediction, probability = predict_reading(model, data)
+                        probability *= 100
                         
-                        # Update UI with full data (including setpoints)
-                        self.window.after(0, self.update_status, machine, 
-                                        data.iloc[0].to_dict(), prediction, probability)
+                        # Hand the full data (including setpoints) to the UI thread
+                        self.incoming.put({'machine': machine, 'data': data,
+                                           'prediction': prediction, 'probability': probability})
                         
                     except Exception as e:
                         print(f"Error processing {machine}: {str(e)}")
-                        print(f"Data shape: {data.shape if 'data' in locals() else 'No data'}")
-                        print(f"Data types: {data.dtypes if 'data' in locals() else 'No data'}")
-                        self.window.after(0, self.update_error_status, machine, str(e))
+                        self.incoming.put({'machine': machine, 'error': str(e)})
                 
-                time.sleep(5)  # Wait 10 seconds before next update
+                time.sleep(MONITOR_INTERVAL)
             
             except Exception as e:
                     print(f"Monitoring error: {str(e)}")
                     time.sleep(1)  # Wait before retrying
 
+    def poll_predictions(self):
+        """Record results from the monitoring thread or the prediction service process"""
+        if not self.monitoring_active:
+            return
+        if self.prediction_service is not None:
+            results = self.prediction_service.drain()
+        else:
+            results = []
+            while True:
+                try:
+                    results.append(self.incoming.get_nowait())
+                except queue.Empty:
+                    break
+        for result in results:
+            if "error" in result:
+                self.update_error_status(result["machine"], result["error"])
+            else:
+                self.update_status(result["machine"], result["data"],
+                                   result["prediction"], result["probability"])
+        self.window.after(RESULT_POLL_MS, self.poll_predictions)
+
     def update_error_status(self, machine, error_msg):
         """Handle error states in the UI"""
-        if not self.window.winfo_exists():
-            return
-        
-        frame = self.machine_frames[machine]
-        frame["status"].configure(text="ERROR", text_color="#FFA500")
-        frame["fault_type"].configure(text=f"Error: {error_msg}", text_color="#FFA500")
+        self.latest_status[machine] = {'error': error_msg}
+        self.render_scheduler.mark('dashboard', machine)
 
     def on_closing(self):
         self.monitoring_active = False
+        if self.prediction_service is not None:
+            self.prediction_service.stop()
         self.window.destroy()
 
 if __name__ == "__main__":